@@ -8,10 +8,23 @@ from discord.ext.commands import Bot
 from pombot import commands
 from pombot import handlers
 from pombot.config import Config, Pomwars, Secrets
+from pombot.lib.storage import Storage
 from pombot.lib.tiny_tools import BotCommand
 
 _log = logging.getLogger(__name__)
-bot = Bot(command_prefix=Config.PREFIX, case_insensitive=True)
+
+
+class PomBot(Bot):
+    """The bot, which also closes storage when it shuts down."""
+    async def close(self):
+        """Write buffered inserts before logging out of Discord."""
+        try:
+            await Storage.close()
+        finally:
+            await super().close()
+
+
+bot = PomBot(command_prefix=Config.PREFIX, case_insensitive=True)
 
 
 @bot.event
@@ -8,7 +8,6 @@ from pombot.config import Reactions
 from pombot.lib.messages import send_embed_message
 from pombot.lib.storage import Storage
 from pombot.lib.types import DateRange
-from pombot.state import State
 
 
 async def do_create_event(ctx: Context, *args):
@@ -72,7 +71,6 @@ async def do_create_event(ctx: Context, *args):
         await ctx.message.add_reaction(Reactions.ROBOT)
         return
 
-    State.goal_reached = False
     fmt = lambda dt: datetime.strftime(dt, "%B %d, %Y")
 
     await send_embed_message(
@@ -1,7 +1,7 @@
 import random
 from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Tuple
+from typing import Optional
 from xml.etree import ElementTree
 
 from discord.ext.commands import Context
@@ -9,6 +9,7 @@ from discord.ext.commands import Context
 from pombot.config import IconUrls
 from pombot.data import Locations
 from pombot.lib.messages import send_embed_message
+from pombot.lib.weighted_sampler import WeightedSampler
 
 
 async def do_fortune(ctx: Context) -> str:
@@ -55,14 +56,15 @@ class _Disclaimer:
         "AVISO",
     )
 
-    _disclaimers: List[Tuple[str, float]] = []
+    _sampler: Optional[WeightedSampler] = None
 
     def __init__(self) -> str:
         """Return a random disclaimer from the memoized list."""
-        if not self._disclaimers:
+        if _Disclaimer._sampler is None:
             root = ElementTree.parse(Locations.DISCLAIMERS).getroot()
-            self._disclaimers = [(elem.text, float(elem.attrib["probability"]))
-                                for elem in root.findall(".//fortune")]
+            disclaimers = [(elem.text, float(elem.attrib["probability"]))
+                           for elem in root.findall(".//fortune")]
+            _Disclaimer._sampler = WeightedSampler(*zip(*disclaimers))
 
-        self.content, = random.choices(*zip(*self._disclaimers))
+        self.content = self._sampler.sample()
         self.type = random.choice(self.POSSIBLE_TYPES)
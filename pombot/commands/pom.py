@@ -1,11 +1,8 @@
 from discord.ext.commands import Context
 
-import pombot.lib.errors
 from pombot.config import Config, Reactions
 from pombot.lib.messages import send_embed_message
 from pombot.lib.storage import Storage
-from pombot.lib.types import DateRange
-from pombot.state import State
 
 
 async def do_pom(ctx: Context, *description):
@@ -48,29 +45,22 @@ async def do_pom(ctx: Context, *description):
     await Storage.add_poms_to_user_session(ctx.author, description, count)
     await ctx.message.add_reaction(Reactions.TOMATO)
 
-    if State.goal_reached:
-        return
+    progress = await Storage.get_event_progress()
 
-    try:
-        ongoing_event, *other_ongoing_events = await Storage.get_ongoing_events()
-    except ValueError:
-        # No ongoing events.
+    if progress.event is None or progress.goal_reached:
         return
 
-    if any(other_ongoing_events):
-        msg = "Only one ongoing event supported."
-        raise pombot.lib.errors.TooManyEventsError(msg)
-
-    current_poms_for_event = await Storage.get_poms(date_range=DateRange(
-        ongoing_event.start_date, ongoing_event.end_date))
+    if progress.num_poms < progress.event.pom_goal:
+        return
 
-    if len(current_poms_for_event) >= ongoing_event.pom_goal:
-        State.goal_reached = True
+    # Only the first bot process to mark the goal gets to announce it.
+    if not await Storage.mark_event_goal_reached(progress.event):
+        return
 
-        await send_embed_message(
-            ctx,
-            title=ongoing_event.event_name,
-            description=(
-                f"We've reached our goal of {ongoing_event.pom_goal} poms! "
-                "Well done and keep up the good work!"),
-        )
+    await send_embed_message(
+        ctx,
+        title=progress.event.event_name,
+        description=(
+            f"We've reached our goal of {progress.event.pom_goal} poms! "
+            "Well done and keep up the good work!"),
+    )
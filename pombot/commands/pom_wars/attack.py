@@ -1,38 +1,19 @@
 import random
-from datetime import datetime, timedelta
+from datetime import datetime
 
 from discord.ext.commands import Context
 
 import pombot.lib.pom_wars.errors as war_crimes
 from pombot.config import Config, Debug, Pomwars, Reactions
-from pombot.data import Locations
-from pombot.data.pom_wars import load_actions_directories
 from pombot.lib.messages import send_embed_message
 from pombot.lib.pom_wars.action_chances import is_action_successful
 from pombot.lib.pom_wars.team import get_user_team
 from pombot.lib.pom_wars.types import Attack
 from pombot.lib.storage import Storage
-from pombot.lib.types import ActionType, DateRange
+from pombot.lib.types import ActionType
 from pombot.state import State
 
 
-async def _get_defensive_multiplier(team: str, timestamp: datetime) -> float:
-    defend_actions = await Storage.get_actions(
-        action_type=ActionType.DEFEND,
-        team=team,
-        was_successful=True,
-        date_range=DateRange(
-            timestamp - timedelta(minutes=Pomwars.DEFEND_DURATION_MINUTES),
-            timestamp,
-        ),
-    )
-    defenders = await Storage.get_users_by_id([a.user_id for a in defend_actions])
-    multipliers = [Pomwars.DEFEND_LEVEL_MULTIPLIERS[d.defend_level] for d in defenders]
-    multiplier = min([sum(multipliers), Pomwars.MAXIMUM_TEAM_DEFENCE])
-
-    return 1 - multiplier
-
-
 async def do_attack(ctx: Context, *args):
     """Attack the other team."""
     timestamp = datetime.now()
@@ -52,14 +33,6 @@ async def do_attack(ctx: Context, *args):
                         f"be fewer than {Config.DESCRIPTION_LIMIT} characters.")
         return
 
-    await Storage.add_poms_to_user_session(
-        ctx.author,
-        description,
-        count=1,
-        time_set=timestamp,
-    )
-    await ctx.message.add_reaction(Reactions.TOMATO)
-
     action = {
         "user":           ctx.author,
         "team":           get_user_team(ctx.author).value,
@@ -72,32 +45,41 @@ async def do_attack(ctx: Context, *args):
         "time_set":       timestamp,
     }
 
-    if not await is_action_successful(ctx.author, timestamp, heavy_attack):
-        emote = random.choice(["¯\\_(ツ)_/¯", "(╯°□°）╯︵ ┻━┻"])
+    # Store the pom and the action together, and only reply once both are.
+    async with Storage.transaction():
+        await Storage.add_poms_to_user_session(
+            ctx.author,
+            description,
+            count=1,
+            time_set=timestamp,
+        )
+
+        if await is_action_successful(ctx.author, timestamp, heavy_attack):
+            action["was_successful"] = True
+            action["was_critical"] = random.random() <= Pomwars.BASE_CHANCE_FOR_CRITICAL
+
+            attack: Attack = State.action_catalog.attacks(
+                is_heavy=heavy_attack,
+                is_critical=action["was_critical"],
+            ).choose()
+
+            defensive_multiplier = State.defence_ledger.get_multiplier(
+                team=(~get_user_team(ctx.author)).value,
+                timestamp=timestamp)
+
+            action["damage"] = attack.damage * defensive_multiplier
+
         await Storage.add_pom_war_action(**action)
+
+    await ctx.message.add_reaction(Reactions.TOMATO)
+
+    if not action["was_successful"]:
+        emote = random.choice(["¯\\_(ツ)_/¯", "(╯°□°）╯︵ ┻━┻"])
         await ctx.send(f"<@{ctx.author.id}>'s attack missed! {emote}")
         return
 
-    action["was_successful"] = True
-    action["was_critical"] = random.random() <= Pomwars.BASE_CHANCE_FOR_CRITICAL
     await ctx.message.add_reaction(Reactions.BOOM)
 
-    attacks = load_actions_directories(
-        Locations.HEAVY_ATTACKS_DIR if heavy_attack else Locations.NORMAL_ATTACKS_DIR,
-        type_=Attack,
-        is_critical=action["was_critical"],
-        is_heavy=heavy_attack,
-    )
-    weights = [attack.weight for attack in attacks]
-    attack, = random.choices(attacks, weights=weights)
-
-    defensive_multiplier = await _get_defensive_multiplier(
-        team=(~get_user_team(ctx.author)).value,
-        timestamp=timestamp)
-
-    action["damage"] = attack.damage * defensive_multiplier
-    await Storage.add_pom_war_action(**action)
-
     await send_embed_message(
         None,
         title=attack.get_title(ctx.author),
@@ -107,7 +89,7 @@ async def do_attack(ctx: Context, *args):
         _func=ctx.reply,
     )
 
-    await State.scoreboard.update()
+    State.scoreboard.mark_dirty()
 
     if Debug.BENCHMARK_POMWAR_ATTACK:
         print(f"!attack took: {datetime.now() - timestamp}")
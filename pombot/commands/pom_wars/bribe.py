@@ -1,21 +1,17 @@
-import random
 from datetime import datetime
 
 from discord.ext.commands import Context
 
-from pombot.data import Locations
-from pombot.data.pom_wars import load_actions_directories
 from pombot.lib.pom_wars.team import get_user_team
 from pombot.lib.pom_wars.types import Bribe
 from pombot.lib.storage import Storage
 from pombot.lib.types import ActionType
+from pombot.state import State
 
 
 async def do_bribe(ctx: Context):
     """What? I don't take bribes..."""
-    bribes = load_actions_directories(Locations.BRIBES_DIR, type_=Bribe)
-    weights = [bribe.weight for bribe in bribes]
-    bribe, = random.choices(bribes, weights=weights)
+    bribe: Bribe = State.action_catalog.bribes.choose()
 
     timestamp = datetime.now()
 
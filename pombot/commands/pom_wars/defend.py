@@ -5,14 +5,13 @@ from discord.ext.commands import Context
 
 import pombot.lib.pom_wars.errors as war_crimes
 from pombot.config import Config, Pomwars, Reactions
-from pombot.data import Locations
-from pombot.data.pom_wars import load_actions_directories
 from pombot.lib.messages import send_embed_message
 from pombot.lib.pom_wars.action_chances import is_action_successful
 from pombot.lib.pom_wars.team import get_user_team
 from pombot.lib.pom_wars.types import Defend
 from pombot.lib.storage import Storage
 from pombot.lib.types import ActionType
+from pombot.state import State
 
 
 async def do_defend(ctx: Context, *args):
@@ -33,14 +32,6 @@ async def do_defend(ctx: Context, *args):
                         f"be fewer than {Config.DESCRIPTION_LIMIT} characters.")
         return
 
-    await Storage.add_poms_to_user_session(
-        ctx.author,
-        descript=description,
-        count=1,
-        time_set=timestamp,
-    )
-    await ctx.message.add_reaction(Reactions.TOMATO)
-
     action = {
         "user":           ctx.author,
         "team":           get_user_team(ctx.author).value,
@@ -52,20 +43,35 @@ async def do_defend(ctx: Context, *args):
         "time_set":       timestamp,
     }
 
-    if not await is_action_successful(ctx.author, timestamp):
+    # Store the pom and the action together, and only reply once both are.
+    async with Storage.transaction():
+        await Storage.add_poms_to_user_session(
+            ctx.author,
+            descript=description,
+            count=1,
+            time_set=timestamp,
+        )
+
+        action["was_successful"] = await is_action_successful(ctx.author, timestamp)
+        await Storage.add_pom_war_action(**action)
+
+    await ctx.message.add_reaction(Reactions.TOMATO)
+
+    if not action["was_successful"]:
         emote = random.choice(["¯\\_(ツ)_/¯", "(╯°□°）╯︵ ┻━┻"])
         await ctx.send(f"<@{ctx.author.id}> defence failed! {emote}")
-        await Storage.add_pom_war_action(**action)
         return
 
-    action["was_successful"] = True
-    await ctx.message.add_reaction(Reactions.SHIELD)
+    State.defence_ledger.add(
+        action["team"],
+        ctx.author.id,
+        timestamp,
+        Pomwars.DEFEND_LEVEL_MULTIPLIERS[defender.defend_level],
+    )
 
-    defends = load_actions_directories(Locations.DEFENDS_DIR, type_=Defend)
-    weights = [defend.weight for defend in defends]
-    defend, = random.choices(defends, weights=weights)
+    await ctx.message.add_reaction(Reactions.SHIELD)
 
-    await Storage.add_pom_war_action(**action)
+    defend: Defend = State.action_catalog.defends.choose()
 
     await send_embed_message(
         None,
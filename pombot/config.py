@@ -4,7 +4,7 @@ from datetime import timedelta
 
 import dotenv
 
-from pombot.lib.tiny_tools import (classproperty, explode_after_char,
+from pombot.lib.tiny_tools import (classproperty, explode_after_char, pity_chances,
                                    positive_int, str2bool)
 
 dotenv.load_dotenv(override=True)
@@ -43,12 +43,32 @@ class Config:
     # Logging
     LOGFILE = "./errors.txt"
 
+    # Storage
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mysql")
+    SQLITE_DATABASE = os.getenv("SQLITE_DATABASE", ":memory:")
+
     # MySQL
     LIVE_DATABASE = os.getenv("MYSQL_DATABASE")
     POMS_TABLE = "poms"
     EVENTS_TABLE = "events"
     USERS_TABLE = "users"
     ACTIONS_TABLE = "actions"
+    TEAM_STATS_TABLE = "team_stats"
+    SCOREBOARD_MESSAGES_TABLE = "scoreboard_messages"
+    MIGRATIONS_TABLE = "schema_migrations"
+    MYSQL_POOL_MIN_SIZE = positive_int(os.getenv("MYSQL_POOL_MIN_SIZE", "1"))
+    MYSQL_POOL_MAX_SIZE = positive_int(os.getenv("MYSQL_POOL_MAX_SIZE", "10"))
+    MYSQL_POOL_ACQUIRE_TIMEOUT_SECONDS = float(
+        os.getenv("MYSQL_POOL_ACQUIRE_TIMEOUT_SECONDS", "10"))
+    MYSQL_POOL_RECYCLE_SECONDS = int(os.getenv("MYSQL_POOL_RECYCLE_SECONDS", "3600"))
+    STREAM_BATCH_SIZE = 1000
+    WRITE_BUFFER_ENABLED = str2bool(os.getenv("WRITE_BUFFER_ENABLED", "no"))
+    WRITE_BUFFER_FLUSH_INTERVAL_SECONDS = float(
+        os.getenv("WRITE_BUFFER_FLUSH_INTERVAL_SECONDS", "0.25"))
+    WRITE_BUFFER_MAX_ROWS = positive_int(os.getenv("WRITE_BUFFER_MAX_ROWS", "500"))
+    WRITE_BUFFER_MAX_ATTEMPTS = 5
+    USER_CACHE_SIZE = positive_int(os.getenv("USER_CACHE_SIZE", "10000"))
+    EVENT_PROGRESS_MAX_AGE_SECONDS = float(os.getenv("EVENT_PROGRESS_MAX_AGE_SECONDS", "30"))
 
     # Restrictions
     ADMIN_ROLES = os.getenv("ADMIN_ROLES").split(",")
@@ -114,6 +134,10 @@ class Pomwars:
         int(guild.strip()) if guild.strip() else 0
         for guild in os.getenv("VIKING_ONLY_GUILDS").split(",")
     ]
+    SCOREBOARD_REFRESH_SECONDS = float(os.getenv("SCOREBOARD_REFRESH_SECONDS", "5"))
+    SCOREBOARD_MAX_CONCURRENT_UPDATES = 5
+    ACTIONS_RELOAD_SECONDS = float(os.getenv("ACTIONS_RELOAD_SECONDS", "10"))
+    CHECK_ACTIONS_BUNDLE_AGE = str2bool(os.getenv("CHECK_ACTIONS_BUNDLE_AGE", "no"))
 
     HEAVY_ATTACK_LEVEL_VALIANT_ATTEMPT_CONDOLENCE_REWARDS = {
         # Level: (Min chance, Max chance)
@@ -124,6 +148,8 @@ class Pomwars:
         5:       (0.37,       0.87),
     }
     HEAVY_PITY_INCREMENT = 0.10
+    HEAVY_ATTACK_PITY_CHANCES = pity_chances(
+        HEAVY_ATTACK_LEVEL_VALIANT_ATTEMPT_CONDOLENCE_REWARDS, HEAVY_PITY_INCREMENT)
     HEAVY_QUALIFIERS = ["heavy", "hard", "sharp", "strong"]
 
     DEFEND_LEVEL_MULTIPLIERS = {1: 0.05, 2: 0.08, 3: 0.07, 4: 0.08, 5: 0.09}
@@ -1,5 +1,11 @@
+import hashlib
+import json
 import logging
+from functools import lru_cache
 from pathlib import Path
+from typing import Dict, List, Optional
+
+from pombot.config import Pomwars
 
 THIS_DIR = Path(__file__).parent
 POM_WARS_DATA_DIR = THIS_DIR / "pom_wars"
@@ -20,6 +26,11 @@ class Locations:
     DEFENDS_DIR = POM_WARS_DATA_DIR / "defends"
     BRIBES_DIR = POM_WARS_DATA_DIR / "bribes"
 
+    # Built by `make bundle`; see `write_actions_bundle`.
+    ACTIONS_BUNDLE = THIS_DIR / "pom_wars.bundle.json"
+
+ACTIONS_BUNDLE_VERSION = 1
+
 
 # Check sanity to discover errors in folder structure during developement.
 def _check_is_actions_dir(path: Path) -> True:
@@ -45,16 +56,111 @@ def _check_is_actions_dir(path: Path) -> True:
                 f"Missing {', '.join(missing_items)} in {item}")
 
 
-for attr in vars(Locations):
-    name, *_ = attr.split("__")
+def read_actions_dir(path: Path) -> List[Dict[str, str]]:
+    """Return the name, message and meta of each action in a directory.
+
+    Subdirectories starting with "~", such as "~criticals", are skipped.
+    """
+    return [
+        {
+            "name": subdir.name,
+            "message": (subdir / Locations.MESSAGE).read_text(encoding="utf8"),
+            "meta": (subdir / Locations.META).read_text(encoding="utf8"),
+        }
+        for subdir in sorted(path.iterdir())
+        if subdir.is_dir() and not subdir.name.startswith("~")
+    ]
+
+
+def _checksum(categories: Dict[str, List[Dict[str, str]]]) -> str:
+    canonical = json.dumps(categories, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf8")).hexdigest()
+
+
+def _newest_mtime(paths: List[Path]) -> float:
+    return max(item.stat().st_mtime
+               for path in paths for item in [path, *path.rglob("*")])
+
+
+def newest_actions_mtime() -> float:
+    """Return the latest modification time of any file in the actions
+    directories.
+    """
+    return _newest_mtime(_actions_dirs())
+
+
+def write_actions_bundle(categories: Dict[str, List[Dict[str, str]]]):
+    """Write the actions, as read by `read_actions_dir` per category, into
+    the bundle, so that the bot can load them in one read at startup.
+    """
+    bundle = {
+        "version": ACTIONS_BUNDLE_VERSION,
+        "checksum": _checksum(categories),
+        "categories": categories,
+    }
+
+    Locations.ACTIONS_BUNDLE.write_text(json.dumps(bundle, indent=1), encoding="utf8")
+    load_actions_bundle.cache_clear()
+
+
+@lru_cache(maxsize=None)
+def load_actions_bundle() -> Optional[Dict[str, List[Dict[str, str]]]]:
+    """Return the actions per category from the bundle, or None when the
+    bundle is missing, of another version, corrupt or out of date.
+
+    The bundle is trusted to have been rebuilt along with the tree. With
+    CHECK_ACTIONS_BUNDLE_AGE, it is only used when it is newer than every
+    file in the actions directories, so that actions being edited are never
+    shadowed by an old bundle.
+    """
+    try:
+        bundle = json.loads(Locations.ACTIONS_BUNDLE.read_text(encoding="utf8"))
+    except FileNotFoundError:
+        return None
+    except ValueError:
+        _log.warning("Ignoring unreadable actions bundle")
+        return None
+
+    if bundle.get("version") != ACTIONS_BUNDLE_VERSION:
+        _log.warning("Ignoring actions bundle of version %s", bundle.get("version"))
+        return None
+
+    if _checksum(bundle.get("categories")) != bundle.get("checksum"):
+        _log.warning("Ignoring actions bundle with a bad checksum")
+        return None
+
+    if Pomwars.CHECK_ACTIONS_BUNDLE_AGE and (Locations.ACTIONS_BUNDLE.stat().st_mtime
+                                             < newest_actions_mtime()):
+        _log.info("Ignoring actions bundle older than the actions directories")
+        return None
+
+    return bundle["categories"]
+
+
+def _actions_dirs() -> List[Path]:
+    locations = []
+
+    for attr in vars(Locations):
+        name, *_ = attr.split("__")
+
+        if (not name or not hasattr(Locations, name)
+                or not name.casefold().endswith("dir")):
+            continue
+
+        locations.append(getattr(Locations, name).resolve())
+
+    return locations
+
 
-    if (not name or not hasattr(Locations, name)
-            or not name.casefold().endswith("dir")):
-        continue
+def check_locations():
+    """Check every actions directory in Locations."""
+    for location in _actions_dirs():
+        if not location.is_dir():
+            raise RuntimeError(f"Variable named '{location}' is not a directory")
 
-    location: Path = getattr(Locations, name).resolve()
+        _check_is_actions_dir(location)
 
-    if not location.is_dir():
-        raise RuntimeError(f"Variable named '{location}' is not a directory")
 
-    _check_is_actions_dir(location)
+# The bundle was checked when it was built.
+if load_actions_bundle() is None:
+    check_locations()
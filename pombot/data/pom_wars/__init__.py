@@ -1,20 +1,19 @@
+from dataclasses import dataclass, field
 from functools import partial
-from pathlib import Path
-from typing import Any, List, Union
+from typing import Any, Dict, List, Tuple, Union
 
+from pombot.data import Locations, load_actions_bundle, read_actions_dir
 from pombot.lib.pom_wars.types import Attack, Bribe, Defend
+from pombot.lib.weighted_sampler import WeightedSampler
 
 
-def load_actions_directories(
-    actions_dir: Path,
+def _create_actions(
+    actions: List[Dict[str, str]],
     type_: Union[Attack, Defend, Bribe],
     *,
     is_heavy: bool = False,
     is_critical: bool = False,
 ) -> List[Any]:
-    actions = []
-    actions_dir = actions_dir / "~criticals" if is_critical else actions_dir
-
     attack_kwargs = {"is_heavy": is_heavy, "is_critical": is_critical}
 
     action_types = {
@@ -23,10 +22,91 @@ def load_actions_directories(
         Bribe:  Bribe,
     }
 
-    for subdir in actions_dir.iterdir():
-        if subdir.name.startswith("~"):
-            continue
+    return [action_types[type_](**action) for action in actions]
+
+
+# Where each category of the ActionCatalog comes from: its actions directory,
+# action type and the keyword arguments to create its actions with.
+_CATEGORY_SOURCES = {
+    "normal_attacks": (Locations.NORMAL_ATTACKS_DIR, Attack, {}),
+    "critical_normal_attacks": (Locations.NORMAL_ATTACKS_DIR, Attack,
+                                {"is_critical": True}),
+    "heavy_attacks": (Locations.HEAVY_ATTACKS_DIR, Attack, {"is_heavy": True}),
+    "critical_heavy_attacks": (Locations.HEAVY_ATTACKS_DIR, Attack,
+                               {"is_heavy": True, "is_critical": True}),
+    "defends": (Locations.DEFENDS_DIR, Defend, {}),
+    "bribes": (Locations.BRIBES_DIR, Bribe, {}),
+}
+
+
+def read_action_categories() -> Dict[str, List[Dict[str, str]]]:
+    """Walk the actions directories, returning the name, message and meta
+    of every action per ActionCatalog category.
+    """
+    return {
+        name: read_actions_dir(
+            directory / "~criticals" if kwargs.get("is_critical") else directory)
+        for name, (directory, _, kwargs) in _CATEGORY_SOURCES.items()
+    }
+
+
+@dataclass(frozen=True)
+class ActionCategory:
+    """Actions of one kind, with their weights ready to choose from."""
+    actions: Tuple[Any, ...]
+    weights: Tuple[float, ...]
+    sampler: WeightedSampler = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "sampler", WeightedSampler(self.actions, self.weights))
+
+    @classmethod
+    def from_actions(cls, actions: List[Any]) -> "ActionCategory":
+        """Create the category, taking the weights from the actions."""
+        return cls(tuple(actions), tuple(action.weight for action in actions))
+
+    def choose(self, rng=None) -> Any:
+        """Return a random action, according to the weights.
+
+        @param rng Source of randomness, e.g. a seeded `random.Random`;
+            defaults to the `random` module.
+        """
+        return self.sampler.sample(rng)
+
+
+@dataclass(frozen=True)
+class ActionCatalog:
+    """Every Pom War action, read from the bundle or the data directories
+    once.
+    """
+    normal_attacks: ActionCategory
+    critical_normal_attacks: ActionCategory
+    heavy_attacks: ActionCategory
+    critical_heavy_attacks: ActionCategory
+    defends: ActionCategory
+    bribes: ActionCategory
+
+    @classmethod
+    def load(cls, *, use_bundle: bool = True) -> "ActionCatalog":
+        """Read the actions bundle, or all of the actions directories when
+        the bundle is not usable.
+
+        @param use_bundle Whether to try the bundle at all.
+        """
+        categories = ((use_bundle and load_actions_bundle())
+                      or read_action_categories())
 
-        actions.append(action_types[type_](subdir))
+        return cls(**{
+            name: ActionCategory.from_actions(
+                _create_actions(categories[name], type_, **kwargs))
+            for name, (_, type_, kwargs) in _CATEGORY_SOURCES.items()
+        })
 
-    return actions
+    def attacks(self, *, is_heavy: bool, is_critical: bool) -> ActionCategory:
+        """Return the category of attacks of the given kind."""
+        return {
+            (False, False): self.normal_attacks,
+            (False, True):  self.critical_normal_attacks,
+            (True, False):  self.heavy_attacks,
+            (True, True):   self.critical_heavy_attacks,
+        }[(is_heavy, is_critical)]
@@ -0,0 +1,19 @@
+"""Compile the actions directories into a single bundle file.
+
+Run with `make bundle` (or `python -m pombot.data.pom_wars.bundle`) after
+changing any action, and before deploying.
+"""
+from pombot.data import Locations, check_locations, write_actions_bundle
+from pombot.data.pom_wars import read_action_categories
+
+
+def main():
+    """Check the actions directories and write the bundle."""
+    check_locations()
+    write_actions_bundle(read_action_categories())
+
+    print(f"Wrote {Locations.ACTIONS_BUNDLE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
 from discord.ext.commands.bot import Bot
 
 import pombot.commands.pom_wars as commands
+from pombot.lib.pom_wars.catalog_watcher import CatalogWatcher
 from pombot.lib.tiny_tools import BotCommand
+from pombot.state import State
 
 
 def setup(bot: Bot):
@@ -17,3 +19,6 @@ def setup(bot: Bot):
         BotCommand(commands.do_defend,  name="defend"),
     ]:
         bot.add_command(command)
+
+    State.catalog_watcher = CatalogWatcher()
+    State.action_catalog = State.catalog_watcher.load_catalog()
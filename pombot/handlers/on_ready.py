@@ -6,6 +6,7 @@ from discord.ext.commands import Bot
 
 from pombot.state import State
 from pombot.config import Config, Debug, Secrets
+from pombot.lib.errors import TooManyEventsError
 from pombot.lib.storage import Storage
 
 _log = logging.getLogger(__name__)
@@ -13,9 +14,11 @@ _log = logging.getLogger(__name__)
 
 async def on_ready(bot: Bot):
     """Startup procedure after bot has logged into Discord."""
+    _log.info("STORAGE_BACKEND: %s", Config.STORAGE_BACKEND)
     _log.info("MYSQL_DATABASE: %s", Secrets.MYSQL_DATABASE)
 
     State.event_loop = asyncio.get_event_loop()
+    await Storage.backend.open()
 
     active_channels = ", ".join(f"#{channel}" for channel in Config.POM_CHANNEL_NAMES)
 
@@ -44,4 +47,14 @@ async def on_ready(bot: Bot):
 
         await Storage.delete_all_rows_from_all_tables()
 
+    State.storage_ready.set()
+
+    num_cached_users = await Storage.warm_user_cache()
+    _log.info("Cached users: %d", num_cached_users)
+
+    try:
+        await Storage.get_event_progress()
+    except TooManyEventsError as exc:
+        _log.error("Cannot track event progress: %s", exc)
+
     _log.info("READY ON DISCORD AS: %s", bot.user)
@@ -79,7 +79,7 @@ async def on_raw_reaction_add(bot: Bot, payload: RawReactionActionEvent):
         role, = [r for r in guild.roles if r.name == team.value]
         await payload.member.add_roles(role)
 
-        await State.scoreboard.update()
+        State.scoreboard.mark_dirty()
 
     if payload.emoji.name in TIMEZONES:
         user = await Storage.get_user_by_id(payload.user_id)
@@ -5,12 +5,23 @@ from discord.ext.commands import Bot
 from pombot.config import Pomwars
 from pombot.state import State
 from pombot.lib.pom_wars.scoreboard import Scoreboard
+from pombot.lib.storage import Storage
 
 _log = logging.getLogger(__name__)
 
 
 async def on_ready(bot: Bot):
     """Find and remember the static scoreboard for all connected guilds."""
+    await State.storage_ready.wait()
+
+    # Heal any drift between the ledger and the running totals, such as from
+    # writes lost to a crash.
+    await Storage.rebuild_team_stats()
+    await Storage.rebuild_defence_ledger()
+
+    # Starting again after reconnecting is a no-op.
+    State.catalog_watcher.start()
+
     channels = []
 
     for guild in bot.guilds:
@@ -18,7 +29,12 @@ async def on_ready(bot: Bot):
             if channel.name == Pomwars.JOIN_CHANNEL_NAME:
                 channels.append(channel)
 
+    # on_ready fires again after reconnecting.
+    if State.scoreboard is not None:
+        State.scoreboard.stop()
+
     State.scoreboard = Scoreboard(bot, channels)
+    await State.scoreboard.load_message_ids()
     full_channels, restricted_channels = await State.scoreboard.update()
 
     for channel in full_channels:
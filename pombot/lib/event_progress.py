@@ -0,0 +1,79 @@
+from datetime import datetime
+from typing import Optional, Set
+
+from pombot.lib.types import Event
+
+
+class EventProgress:
+    """A running count of the poms added during the ongoing event.
+
+    The count is only trusted until it is seeded again, at the latest when
+    the ongoing event ends or the next event begins.
+
+    Events known to have reached their goal are remembered for the lifetime
+    of the bot, so their poms never need to be counted again.
+    """
+    def __init__(self):
+        self.event: Optional[Event] = None
+        self.num_poms = 0
+        self._valid_until: Optional[datetime] = None
+        self._is_seeded = False
+        self._ids_of_events_with_goal_reached: Set[int] = set()
+
+    @property
+    def goal_reached(self) -> bool:
+        """Whether the ongoing event has reached its goal."""
+        if self.event is None:
+            return False
+
+        return (self.event.goal_reached
+                or self.event.event_id in self._ids_of_events_with_goal_reached)
+
+    def mark_goal_reached(self, event: Event):
+        """Remember that the event has reached its goal."""
+        self._ids_of_events_with_goal_reached.add(event.event_id)
+
+    def seed(self, event: Optional[Event], num_poms: int, valid_until: Optional[datetime]):
+        """Set the ongoing event (or None) and its current number of poms.
+
+        @param event The ongoing event, or None when there is none.
+        @param num_poms Number of poms already added during the event.
+        @param valid_until When the count must be seeded again, no later than
+            when the ongoing event ends or, without one, when the next event
+            starts; None to trust it until invalidated.
+        """
+        self.event = event
+        self.num_poms = num_poms
+        self._valid_until = valid_until
+        self._is_seeded = True
+
+    def invalidate(self):
+        """Forget the count so that it is seeded again on next use."""
+        self._is_seeded = False
+
+    def is_valid_at(self, timestamp: datetime) -> bool:
+        """Return whether the count can be trusted at the given time."""
+        if not self._is_seeded:
+            return False
+
+        return self._valid_until is None or timestamp <= self._valid_until
+
+    def _is_during_event(self, timestamp: datetime) -> bool:
+        return (self._is_seeded and self.event is not None
+                and self.event.start_date <= timestamp <= self.event.end_date)
+
+    def add_poms(self, time_set: datetime, count: int):
+        """Count poms which were just stored."""
+        if self._is_during_event(time_set):
+            self.num_poms += count
+
+    def remove_poms(self, time_set: Optional[datetime], count: int):
+        """Uncount poms which were just deleted.
+
+        When the deleted poms do not share a known timestamp, they cannot be
+        attributed to the event and the count is invalidated instead.
+        """
+        if time_set is None:
+            self.invalidate()
+        elif self._is_during_event(time_set):
+            self.num_poms = max(0, self.num_poms - count)
@@ -0,0 +1,69 @@
+"""Numbered changes to the database schema.
+
+The tables in `Storage.TABLES` describe the schema as it was first created.
+Any later change to the schema (indexes, new columns) is appended here as a
+new Migration with the next version number, and must never be edited once
+released: the database remembers which versions it has already applied.
+"""
+from dataclasses import dataclass
+from typing import Tuple
+
+from pombot.config import Config
+
+
+@dataclass(frozen=True)
+class Migration:
+    """A forward-only change to the database schema."""
+    version: int
+    description: str
+    statements: Tuple[str, ...]
+
+
+# Tech debt: MySQL commits DDL statements implicitly, so a migration cannot
+# be rolled back halfway. Keep migrations to a single statement where
+# possible so that a failure can simply be retried.
+MIGRATIONS = [
+    Migration(1, "Index poms by user, session and description", (
+        f"""CREATE INDEX idx_poms_user_session_descript
+            ON {Config.POMS_TABLE} (userID, current_session, descript);""",
+    )),
+    Migration(2, "Index poms by time set", (
+        f"""CREATE INDEX idx_poms_time_set
+            ON {Config.POMS_TABLE} (time_set);""",
+    )),
+    Migration(3, "Index actions by user and time set", (
+        f"""CREATE INDEX idx_actions_user_time_set
+            ON {Config.ACTIONS_TABLE} (userID, time_set);""",
+    )),
+    Migration(4, "Index actions by team and type", (
+        f"""CREATE INDEX idx_actions_team_type
+            ON {Config.ACTIONS_TABLE} (team, type);""",
+    )),
+    Migration(5, "Index successful actions of a type by team and time set", (
+        f"""CREATE INDEX idx_actions_type_team_successful_time_set
+            ON {Config.ACTIONS_TABLE} (type, team, was_successful, time_set);""",
+    )),
+    Migration(6, "Index users by team", (
+        f"""CREATE INDEX idx_users_team
+            ON {Config.USERS_TABLE} (team);""",
+    )),
+    Migration(7, "Remember whether each event reached its goal", (
+        f"""ALTER TABLE {Config.EVENTS_TABLE}
+            ADD COLUMN goal_reached TINYINT(1) NOT NULL DEFAULT 0;""",
+    )),
+    Migration(8, "Count each user's unsuccessful actions in a row", (
+        f"""ALTER TABLE {Config.USERS_TABLE}
+            ADD COLUMN miss_streak INT NOT NULL DEFAULT 0;""",
+    )),
+    Migration(9, "Remember the day of each user's unsuccessful actions in a row", (
+        f"""ALTER TABLE {Config.USERS_TABLE}
+            ADD COLUMN miss_streak_date DATE;""",
+    )),
+]
+
+
+# Check sanity to discover numbering mistakes during development.
+for _expected_version, _migration in enumerate(MIGRATIONS, start=1):
+    if _migration.version != _expected_version:
+        raise RuntimeError(f"Migration '{_migration.description}' has version "
+                           f"{_migration.version}, expected {_expected_version}")
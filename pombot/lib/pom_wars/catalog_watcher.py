@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from pombot.config import Pomwars
+from pombot.data import check_locations, newest_actions_mtime
+from pombot.data.pom_wars import ActionCatalog
+from pombot.state import State
+
+_log = logging.getLogger(__name__)
+
+
+class CatalogWatcher:
+    """Reload the ActionCatalog when the actions directories change.
+
+    The directories are polled for their newest modification time. When it
+    changes, they are checked and read into a new catalog, which replaces
+    State.action_catalog in one assignment. Commands already running keep
+    the catalog they started with. A change that fails the checks is logged
+    and the current catalog is kept until the next change.
+    """
+    def __init__(self) -> None:
+        self._loaded_at: Optional[float] = None
+        self._mtime: Optional[float] = None
+        self._poll_task: Optional[asyncio.Task] = None
+
+    def load_catalog(self) -> ActionCatalog:
+        """Load the catalog at startup.
+
+        Actions changed after this are reloaded by the first poll, without
+        walking the directories here.
+        """
+        self._loaded_at = time.time()
+
+        return ActionCatalog.load()
+
+    def start(self):
+        """Start polling in the background, unless already polling or
+        disabled by ACTIONS_RELOAD_SECONDS.
+        """
+        if Pomwars.ACTIONS_RELOAD_SECONDS <= 0:
+            return
+
+        if self._poll_task is None or self._poll_task.done():
+            self._poll_task = asyncio.create_task(self._poll())
+
+    def stop(self):
+        """Stop polling in the background."""
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            self._poll_task = None
+
+    async def _poll(self):
+        while True:
+            try:
+                await self.reload_if_changed()
+            except Exception:  # pylint: disable=broad-except
+                _log.exception("Failed to reload the actions")
+
+            await asyncio.sleep(Pomwars.ACTIONS_RELOAD_SECONDS)
+
+    async def reload_if_changed(self) -> bool:
+        """Swap in a new catalog if any action changed since the last time,
+        or, the first time, since the catalog was loaded.
+
+        @return Whether the catalog was replaced.
+        """
+        # The file system is walked in a thread to keep the bot responsive.
+        mtime = await asyncio.to_thread(newest_actions_mtime)
+        last_mtime, self._mtime = self._mtime, mtime
+
+        if last_mtime is None:
+            is_changed = self._loaded_at is not None and mtime > self._loaded_at
+        else:
+            is_changed = mtime != last_mtime
+
+        if not is_changed:
+            return False
+
+        try:
+            catalog = await asyncio.to_thread(self._load)
+        except (OSError, RuntimeError, ValueError, AttributeError) as exc:
+            _log.error("Keeping the current actions, the changed ones are invalid: %s",
+                       exc)
+            return False
+
+        State.action_catalog = catalog
+        _log.info("Reloaded the actions")
+
+        return True
+
+    @staticmethod
+    def _load() -> ActionCatalog:
+        check_locations()
+
+        # The bundle does not follow edits to the directories.
+        return ActionCatalog.load(use_bundle=False)
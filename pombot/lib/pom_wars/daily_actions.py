@@ -0,0 +1,46 @@
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class DailyActions:
+    """What the success of a user's next action depends on: their actions
+    so far that day.
+    """
+    count: int
+    num_misses: int  # Consecutive unsuccessful actions, most recent last.
+
+    def after(self, was_successful: bool) -> "DailyActions":
+        """Return the tally after one more action."""
+        return DailyActions(self.count + 1, 0 if was_successful else self.num_misses + 1)
+
+
+class DailyActionCounter:
+    """A tally of each user's actions on their latest day of actions,
+    seeded once per day and added to as their actions are stored.
+    """
+    def __init__(self):
+        self._tallies: Dict[int, Tuple[date, DailyActions]] = {}
+
+    def get(self, user_id: int, day: date) -> Optional[DailyActions]:
+        """Return the user's tally of the day, or None when not seeded."""
+        tally_day, tally = self._tallies.get(user_id, (None, None))
+        return tally if tally_day == day else None
+
+    def seed(self, user_id: int, day: date, actions: DailyActions):
+        """Set the user's tally of the day, replacing any earlier day's."""
+        self._tallies[user_id] = (day, actions)
+
+    def add(self, user_id: int, day: date, was_successful: bool):
+        """Count an action which was just stored, if the day is seeded."""
+        if tally := self.get(user_id, day):
+            self._tallies[user_id] = (day, tally.after(was_successful))
+
+    def invalidate(self, user_id: int):
+        """Forget the user's tally so that it is seeded again on next use."""
+        self._tallies.pop(user_id, None)
+
+    def clear(self):
+        """Forget every tally so that each is seeded again on next use."""
+        self._tallies.clear()
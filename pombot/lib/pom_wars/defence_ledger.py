@@ -0,0 +1,53 @@
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from typing import Deque, Dict, Tuple
+
+from pombot.config import Pomwars
+
+
+class DefenceLedger:
+    """The successful defends still protecting each team.
+
+    Each defend protects its team for DEFEND_DURATION_MINUTES, so every team
+    keeps a queue of (expiry, defender, multiplier) entries in the order they
+    were added. Expired entries are dropped from the front whenever the
+    team's defence is asked for. A defender counts once however many of
+    their defends are active.
+    """
+    def __init__(self):
+        self._defences: Dict[str, Deque[Tuple[datetime, int, float]]] = \
+            defaultdict(deque)
+
+    def add(self, team: str, user_id: int, time_set: datetime, multiplier: float):
+        """Record a successful defend.
+
+        @param team Value of the defending team.
+        @param user_id ID of the defender.
+        @param time_set When the defend was made.
+        @param multiplier The defender's DEFEND_LEVEL_MULTIPLIERS entry.
+        """
+        expiry = time_set + timedelta(minutes=Pomwars.DEFEND_DURATION_MINUTES)
+        self._defences[team].append((expiry, user_id, multiplier))
+
+    def clear(self):
+        """Forget every defend."""
+        self._defences.clear()
+
+    def get_multiplier(self, team: str, timestamp: datetime) -> float:
+        """Return the factor by which an attack on the team at the given
+        time is reduced, e.g. 0.9 for a defence of 10%.
+        """
+        defences = self._defences[team]
+
+        while defences and defences[0][0] < timestamp:
+            defences.popleft()
+
+        # Defends made after the attack started are not counted yet.
+        latest_expiry = timestamp + timedelta(minutes=Pomwars.DEFEND_DURATION_MINUTES)
+        # Concurrent defends may be added slightly out of order, so expired
+        # entries can remain behind the first unexpired one.
+        multipliers = {user_id: multiplier for expiry, user_id, multiplier in defences
+                       if timestamp <= expiry <= latest_expiry}
+        defence = sum(multipliers.values())
+
+        return 1 - min(defence, Pomwars.MAXIMUM_TEAM_DEFENCE)
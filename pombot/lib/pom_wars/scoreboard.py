@@ -1,12 +1,19 @@
-from typing import List
+import asyncio
+import logging
+from functools import partial
+from typing import Dict, List, Optional, Tuple
 
 import discord.errors
-from discord.channel import ChannelType
+from discord.channel import ChannelType, TextChannel
 from discord.ext.commands.bot import Bot
+from discord.message import Message
 
 from pombot.config import Pomwars, Reactions
 from pombot.lib.messages import EmbedField, send_embed_message
 from pombot.lib.pom_wars.team import Team
+from pombot.lib.storage import Storage
+
+_log = logging.getLogger(__name__)
 
 
 class Scoreboard:
@@ -14,6 +21,41 @@ class Scoreboard:
     def __init__(self, bot: Bot, scoreboard_channels: List) -> None:
         self.bot = bot
         self.scoreboard_channels = scoreboard_channels
+        self._is_dirty = asyncio.Event()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._message_ids: Dict[int, int] = {}
+        self._rendered_hashes: Dict[int, int] = {}
+
+    def mark_dirty(self):
+        """Request a refresh of the scoreboard without waiting for it.
+
+        Refreshes happen in the background, at most once per
+        SCOREBOARD_REFRESH_SECONDS, so a burst of requests results in a
+        single update.
+        """
+        self._is_dirty.set()
+
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_when_dirty())
+
+    def stop(self):
+        """Stop refreshing in the background."""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+
+    async def _refresh_when_dirty(self):
+        while True:
+            await self._is_dirty.wait()
+            self._is_dirty.clear()
+
+            try:
+                await self.update()
+            except Exception:  # pylint: disable=broad-except
+                # The next request will try again.
+                _log.exception("Failed to refresh the scoreboard")
+
+            await asyncio.sleep(Pomwars.SCOREBOARD_REFRESH_SECONDS)
 
     async def update(self) -> List[ChannelType]:
         """Updates or creates the live scoreboards of all guilds.
@@ -36,93 +78,173 @@ class Scoreboard:
         knights, vikings = Team.KNIGHTS, Team.VIKINGS
         winner = None
 
+        all_stats = await Storage.get_all_team_stats()
+        knight_stats, viking_stats = all_stats[knights.value], all_stats[vikings.value]
+
         stats = {
             knights: {
-                "damage":      await knights.damage,
-                "fav_attack":  await knights.favorite_action,
-                "population":  await knights.population,
-                "num_attacks": await knights.attack_count,
+                "damage":      knight_stats.damage,
+                "fav_attack":  knight_stats.favorite_action,
+                "population":  knight_stats.population,
+                "num_attacks": knight_stats.attack_count,
             },
             vikings: {
-                "damage":      await vikings.damage,
-                "fav_attack":  await vikings.favorite_action,
-                "population":  await vikings.population,
-                "num_attacks": await vikings.attack_count,
+                "damage":      viking_stats.damage,
+                "fav_attack":  viking_stats.favorite_action,
+                "population":  viking_stats.population,
+                "num_attacks": viking_stats.attack_count,
             }
         }
 
         if stats[knights]["damage"] != stats[vikings]["damage"]:
             winner = knights if stats[vikings]["damage"] < stats[knights]["damage"] else vikings
 
-        for channel in self.scoreboard_channels:
-            history = channel.history(limit=1, oldest_first=True)
-
-            lines = [
-                "{dmg} damage dealt {emt}",
-                "** **",
-                "`Attacks:` {attacks} attacks",
-                "`Favorite Attack:` {fav}",
-                "`Member Count:` {participants} participants",
-            ]
-
-            knight_values = {
-                "dmg": stats[knights]["damage"],
-                "emt": Pomwars.Emotes.ATTACK,
-                "fav": stats[knights]["fav_attack"],
-                "attacks": stats[knights]["num_attacks"],
-                "participants": stats[knights]["population"],
-            }
+        lines = [
+            "{dmg} damage dealt {emt}",
+            "** **",
+            "`Attacks:` {attacks} attacks",
+            "`Favorite Attack:` {fav}",
+            "`Member Count:` {participants} participants",
+        ]
+
+        knight_values = {
+            "dmg": stats[knights]["damage"],
+            "emt": Pomwars.Emotes.ATTACK,
+            "fav": stats[knights]["fav_attack"],
+            "attacks": stats[knights]["num_attacks"],
+            "participants": stats[knights]["population"],
+        }
 
-            viking_values = {
-                "dmg": stats[vikings]["damage"],
-                "emt": Pomwars.Emotes.ATTACK,
-                "fav": stats[vikings]["fav_attack"],
-                "attacks": stats[vikings]["num_attacks"],
-                "participants": stats[vikings]["population"],
-            }
+        viking_values = {
+            "dmg": stats[vikings]["damage"],
+            "emt": Pomwars.Emotes.ATTACK,
+            "fav": stats[vikings]["fav_attack"],
+            "attacks": stats[vikings]["num_attacks"],
+            "participants": stats[vikings]["population"],
+        }
 
-            fields = [
-                EmbedField(
-                    name="{emt} Knights {win}".format(
-                        emt=Pomwars.Emotes.KNIGHT,
-                        win=f"{Pomwars.Emotes.WINNER}" if winner==knights else "",
-                    ),
-                    value="\n".join(lines).format(**knight_values),
+        fields = [
+            EmbedField(
+                name="{emt} Knights {win}".format(
+                    emt=Pomwars.Emotes.KNIGHT,
+                    win=f"{Pomwars.Emotes.WINNER}" if winner==knights else "",
                 ),
-                EmbedField(
-                    name="{emt} Vikings {win}".format(
-                        emt=Pomwars.Emotes.VIKING,
-                        win=f"{Pomwars.Emotes.WINNER}" if winner==vikings else "",
-                    ),
-                    value="\n".join(lines).format(**viking_values),
+                value="\n".join(lines).format(**knight_values),
+            ),
+            EmbedField(
+                name="{emt} Vikings {win}".format(
+                    emt=Pomwars.Emotes.VIKING,
+                    win=f"{Pomwars.Emotes.WINNER}" if winner==vikings else "",
                 ),
-            ]
+                value="\n".join(lines).format(**viking_values),
+            ),
+        ]
 
-            msg_title = "Pom War Season 3 Warboard"
-            msg_footer = f"React with {Reactions.WAR_JOIN_REACTION} to join a team!"
+        semaphore = asyncio.Semaphore(Pomwars.SCOREBOARD_MAX_CONCURRENT_UPDATES)
 
-            channel_messages = await history.flatten()
-            scoreboard_msg = None
+        async def _update_channel_in_turn(channel: TextChannel) -> bool:
+            async with semaphore:
+                return await self._update_channel(channel, fields)
 
-            if channel_messages:
-                scoreboard_msg = channel_messages[0]
-                if scoreboard_msg.author != self.bot.user:
-                    full_channels.append(channel)
-                    continue
+        # A failure in one channel must not keep the others from updating.
+        results = await asyncio.gather(
+            *(_update_channel_in_turn(channel) for channel in self.scoreboard_channels),
+            return_exceptions=True,
+        )
 
-            try:
-                new_msg = await send_embed_message(
-                    None,
-                    title=msg_title,
-                    description=None,
-                    fields=fields,
-                    footer=msg_footer,
-                    colour=Pomwars.ACTION_COLOUR,
-                    _func=scoreboard_msg.edit if scoreboard_msg else channel.send
-                )
-                if new_msg:
-                    await new_msg.add_reaction(Reactions.WAR_JOIN_REACTION)
-            except discord.errors.Forbidden:
+        for channel, result in zip(self.scoreboard_channels, results):
+            if isinstance(result, discord.errors.Forbidden):
                 restricted_channels.append(channel)
+            elif isinstance(result, Exception):
+                _log.error("Failed to update the scoreboard in '%s' on '%s'",
+                           channel.name, channel.guild.name, exc_info=result)
+            elif isinstance(result, BaseException):
+                raise result
+            elif not result:
+                full_channels.append(channel)
 
         return [full_channels, restricted_channels]
+
+    async def load_message_ids(self):
+        """Remember the scoreboard messages found by previous runs."""
+        self._message_ids = await Storage.get_scoreboard_message_ids()
+
+    async def _remember_message(self, channel: TextChannel, message_id: int):
+        self._message_ids[channel.id] = message_id
+        await Storage.set_scoreboard_message_id(channel.id, message_id)
+
+    async def _find_message(self, channel: TextChannel) -> Tuple[Optional[Message], bool]:
+        """Find the scoreboard message in the channel from its history.
+
+        @return Tuple of the scoreboard message, or None when the channel is
+            empty, and whether the channel can hold the scoreboard.
+        """
+        history = channel.history(limit=1, oldest_first=True)
+        channel_messages = await history.flatten()
+
+        if not channel_messages:
+            return None, True
+
+        scoreboard_msg, = channel_messages
+
+        if scoreboard_msg.author != self.bot.user:
+            return None, False
+
+        await self._remember_message(channel, scoreboard_msg.id)
+
+        return scoreboard_msg, True
+
+    async def _update_channel(self, channel: TextChannel, fields: List[EmbedField]) -> bool:
+        """Edit or create the scoreboard message in one join channel.
+
+        The message is edited through its remembered ID when there is one,
+        without reading the channel; the channel history is only read when
+        that message is unknown or was deleted. Nothing is sent at all when
+        the scoreboard would look the same as after the last update.
+
+        @return Whether the channel holds the scoreboard, i.e. False when
+            the channel starts with a message by someone else.
+        """
+        msg_title = "Pom War Season 3 Warboard"
+        msg_footer = f"React with {Reactions.WAR_JOIN_REACTION} to join a team!"
+        rendered_hash = hash((msg_title, msg_footer, *fields))
+
+        if self._rendered_hashes.get(channel.id) == rendered_hash:
+            return True
+
+        # Forget the hash until the message is known to be up to date.
+        self._rendered_hashes.pop(channel.id, None)
+
+        send = partial(
+            send_embed_message,
+            None,
+            title=msg_title,
+            description=None,
+            fields=fields,
+            footer=msg_footer,
+            colour=Pomwars.ACTION_COLOUR,
+        )
+
+        if (message_id := self._message_ids.get(channel.id)) is not None:
+            try:
+                await send(_func=channel.get_partial_message(message_id).edit)
+                self._rendered_hashes[channel.id] = rendered_hash
+                return True
+            except discord.errors.NotFound:
+                del self._message_ids[channel.id]
+
+        scoreboard_msg, is_scoreboard_channel = await self._find_message(channel)
+
+        if not is_scoreboard_channel:
+            return False
+
+        if scoreboard_msg:
+            await send(_func=scoreboard_msg.edit)
+        else:
+            new_msg = await send(_func=channel.send)
+            await self._remember_message(channel, new_msg.id)
+            await new_msg.add_reaction(Reactions.WAR_JOIN_REACTION)
+
+        self._rendered_hashes[channel.id] = rendered_hash
+
+        return True
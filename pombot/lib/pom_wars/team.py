@@ -2,10 +2,10 @@ from enum import Enum
 
 from discord.user import User
 
-from pombot.config import Config, IconUrls, Pomwars
+from pombot.config import IconUrls, Pomwars
 from pombot.lib.pom_wars import errors as war_crimes
 from pombot.lib.storage import Storage
-from pombot.lib.types import ActionType
+from pombot.lib.types import ActionType, TeamStats
 
 
 def get_user_team(user: User) -> str:
@@ -37,28 +37,27 @@ class Team(str, Enum):
 
         return icons[self]
 
+    @property
+    async def stats(self) -> TeamStats:
+        """All of the team's running totals, in a single lookup."""
+        return await Storage.get_team_stats(self.value)
+
     @property
     async def damage(self) -> int:
         """The team's total damage."""
-        return int(await Storage.sum_team_damage(self.value) / 100.0)
+        return (await self.stats).damage
 
     @property
     async def favorite_action(self) -> ActionType:
         """The team's most-used action."""
-        async def _count_actions(typ: ActionType):
-            await Storage.count_rows_in_table(Config.ACTIONS_TABLE,
-                action_type=typ,
-                team=self.value,
-            )
-
-        return max({typ: await _count_actions(typ) for typ in ActionType})
+        return (await self.stats).favorite_action
 
     @property
     async def attack_count(self) -> int:
         """The team's total number of actions."""
-        return await Storage.count_rows_in_table(Config.ACTIONS_TABLE, team=self.value)
+        return (await self.stats).attack_count
 
     @property
     async def population(self) -> int:
         """The team's population."""
-        return await Storage.count_rows_in_table(Config.USERS_TABLE, team=self.value)
+        return (await self.stats).population
@@ -1,25 +1,29 @@
 import json
-from pathlib import Path
 from string import Template
 
 from discord.ext.commands import Bot
 from discord.user import User as DiscordUser
 
 from pombot.config import Pomwars
-from pombot.data import Locations
 from pombot.lib.types import User as BotUser
 from pombot.lib.pom_wars.team import get_user_team
 from pombot.lib.tiny_tools import normalize_newlines
 
 
 class Attack:
-    """An attack action as specified by file and directory structure."""
-    def __init__(self, directory: Path, is_heavy: bool, is_critical: bool):
-        self.name = directory.name
+    """An attack action as specified by file and directory structure.
+
+    @param name Name of the action's directory.
+    @param message Contents of the action's message.txt.
+    @param meta Contents of the action's meta.json.
+    """
+    def __init__(self, name: str, message: str, meta: str, is_heavy: bool, is_critical: bool):
+        self.name = name
         self.is_heavy = is_heavy
         self.is_critical = is_critical
-        self._message = (directory / Locations.MESSAGE).read_text(encoding="utf8")
-        self._meta = (directory / Locations.META).read_text(encoding="utf8")
+        self._message = message
+        self._meta = meta
+        self._story = normalize_newlines(self._message)
 
         self.chance_for_this_action = None
         self.damage_multiplier = None
@@ -53,7 +57,7 @@ class Attack:
             message_lines += [f"{Pomwars.Emotes.CRITICAL} `Critical attack!`"]
 
         action_result = "\n".join(message_lines)
-        formatted_story = "*" + normalize_newlines(self._message) + "*"
+        formatted_story = "*" + self._story + "*"
 
         return "\n\n".join([action_result, formatted_story])
 
@@ -81,10 +85,11 @@ class Attack:
 
 class Defend:
     """A defend action as specified by file and directory structure."""
-    def __init__(self, directory: Path):
-        self.name = directory.name
-        self._message = (directory / Locations.MESSAGE).read_text(encoding="utf8")
-        self._meta = (directory / Locations.META).read_text(encoding="utf8")
+    def __init__(self, name: str, message: str, meta: str):
+        self.name = name
+        self._message = message
+        self._meta = meta
+        self._story = normalize_newlines(self._message)
 
         self.chance_for_this_action = None
         for key, val in json.loads(self._meta).items():
@@ -99,7 +104,7 @@ class Defend:
         """The markdown-formatted version of the message.txt from the
         action's directory, and its result, as a string.
         """
-        formatted_story = "*" + normalize_newlines(self._message) + "*"
+        formatted_story = "*" + self._story + "*"
         action_result = "** **\n{emt} `{dfn:.0f}% team damage reduction!`".format(
             emt=Pomwars.Emotes.DEFEND,
             dfn=100 * Pomwars.DEFEND_LEVEL_MULTIPLIERS[user.defend_level],
@@ -110,10 +115,11 @@ class Defend:
 
 class Bribe:
     """Fun replies when users try and bribe the bot."""
-    def __init__(self, directory: Path):
-        self.name = directory.name
-        self._message = (directory / Locations.MESSAGE).read_text(encoding="utf8")
-        self._meta = (directory / Locations.META).read_text(encoding="utf8")
+    def __init__(self, name: str, message: str, meta: str):
+        self.name = name
+        self._message = message
+        self._meta = meta
+        self._story = normalize_newlines(self._message)
 
         self.chance_for_this_action = None
         for key, val in json.loads(self._meta).items():
@@ -129,7 +135,7 @@ class Bribe:
         action's directory, and its result, as a string.
         """
 
-        story = Template(normalize_newlines(self._message))
+        story = Template(self._story)
 
         return story.safe_substitute(
             DISPLAY_NAME=user.display_name,
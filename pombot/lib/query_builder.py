@@ -0,0 +1,171 @@
+"""Composable, parameterized SQL statements.
+
+Statements are rendered from the *shape* of their filters (which columns are
+compared, and how) rather than from their values, so any two calls which
+filter the same way produce exactly the same SQL text. Rendered text is
+cached per shape.
+"""
+import re
+from enum import Enum
+from functools import cache
+from typing import Any, Iterable, List, Optional, Tuple
+
+# Condition: (column, operator, number of placeholders).
+Condition = Tuple[str, str, int]
+
+
+class Filters:
+    """A set of conditions for a WHERE clause, all of which must match.
+
+    Methods return the Filters object itself so that they can be chained:
+
+    >>> filters = Filters().equal("userID", 1234).at_least("time_set", start)
+    """
+    def __init__(self):
+        self._conditions: List[Tuple[Condition, Tuple[Any, ...]]] = []
+
+    def _add(self, column: str, operator: str, *args) -> "Filters":
+        self._conditions.append(((column, operator, len(args)), args))
+        return self
+
+    def equal(self, column: str, value: Any) -> "Filters":
+        """Match rows where the column equals the value."""
+        return self._add(column, "=", value)
+
+    def at_least(self, column: str, value: Any) -> "Filters":
+        """Match rows where the column is greater than or equal to the
+        value.
+        """
+        return self._add(column, ">=", value)
+
+    def at_most(self, column: str, value: Any) -> "Filters":
+        """Match rows where the column is less than or equal to the value."""
+        return self._add(column, "<=", value)
+
+    def between(self, column: str, start: Any, end: Any) -> "Filters":
+        """Match rows where the column is within the inclusive range."""
+        return self.at_least(column, start).at_most(column, end)
+
+    def one_of(self, column: str, values: Iterable[Any]) -> "Filters":
+        """Match rows where the column equals any of the values.
+
+        The number of placeholders is rounded up to a power of two by
+        repeating the last value, so that lists of similar lengths share the
+        same statement.
+        """
+        values = list(values)
+
+        if not values:
+            raise ValueError(f"Expected at least one value for {column}")
+
+        num_placeholders = 1 << (len(values) - 1).bit_length()
+        values += [values[-1]] * (num_placeholders - len(values))
+
+        return self._add(column, "IN", *values)
+
+    def _sorted(self) -> List[Tuple[Condition, Tuple[Any, ...]]]:
+        return sorted(self._conditions, key=lambda condition: condition[0])
+
+    @property
+    def shape(self) -> Tuple[Condition, ...]:
+        """The conditions, without their values, in a canonical order."""
+        return tuple(condition for condition, _ in self._sorted())
+
+    @property
+    def args(self) -> List[Any]:
+        """The values of the conditions, in the order of `shape`."""
+        return [arg for _, args in self._sorted() for arg in args]
+
+
+class Aggregate(str, Enum):
+    """SQL aggregate functions."""
+    COUNT = "COUNT"
+    SUM = "SUM"
+    MIN = "MIN"
+    MAX = "MAX"
+    AVG = "AVG"
+
+
+def aggregate(function: Aggregate, column: str = "1") -> str:
+    """Return the aggregate expression of a column, for use as the
+    `columns` of a SELECT.
+
+    Raises:
+        ValueError when the column is not a plain column name or "1".
+    """
+    if not re.fullmatch(r"\w+", column):
+        raise ValueError(f"Cannot aggregate over column: {column}")
+
+    return f"{Aggregate(function).value}({column})"
+
+
+def _render_where(shape: Tuple[Condition, ...]) -> str:
+    clauses = []
+
+    for column, operator, num_placeholders in shape:
+        if operator == "IN":
+            placeholders = ", ".join(["%s"] * num_placeholders)
+            clauses.append(f"{column} IN ({placeholders})")
+        else:
+            clauses.append(f"{column}{operator}%s")
+
+    return " WHERE " + " AND ".join(clauses) if clauses else ""
+
+
+@cache
+def _render_select(
+    table: str,
+    columns: str,
+    shape: Tuple[Condition, ...],
+    order_by: Optional[str],
+    has_limit: bool,
+) -> str:
+    query = f"SELECT {columns} FROM {table}" + _render_where(shape)
+
+    if order_by:
+        query += f" ORDER BY {order_by}"
+
+    if has_limit:
+        query += " LIMIT %s"
+
+    return query + ";"
+
+
+@cache
+def _render_delete(table: str, shape: Tuple[Condition, ...]) -> str:
+    return f"DELETE FROM {table}" + _render_where(shape) + ";"
+
+
+def select(
+    table: str,
+    filters: Filters = None,
+    *,
+    columns: str = "*",
+    order_by: str = None,
+    limit: int = None,
+) -> Tuple[str, List[Any]]:
+    """Return a SELECT statement and its arguments.
+
+    @param table Table from which to select.
+    @param filters Only match rows meeting these conditions.
+    @param columns Comma-separated columns or expressions to select.
+    @param order_by ORDER BY clause, without the keywords.
+    @param limit Maximum number of rows to return.
+    @return Tuple of the query string and a list of its arguments.
+    """
+    filters = filters or Filters()
+    query = _render_select(table, columns, filters.shape, order_by, limit is not None)
+    args = filters.args + ([limit] if limit is not None else [])
+
+    return query, args
+
+
+def delete(table: str, filters: Filters = None) -> Tuple[str, List[Any]]:
+    """Return a DELETE statement and its arguments.
+
+    @param table Table from which to delete.
+    @param filters Only delete rows meeting these conditions.
+    @return Tuple of the query string and a list of its arguments.
+    """
+    filters = filters or Filters()
+    return _render_delete(table, filters.shape), filters.args
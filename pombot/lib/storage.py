@@ -1,70 +1,162 @@
+# Storage is the single facade over every table, so it stays in one module.
+# pylint: disable=too-many-lines
+import dataclasses
 import logging
 from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from datetime import datetime as dt
-from datetime import time, timezone
-from typing import List, Optional, Set
+from datetime import time, timedelta, timezone
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple, Union
 
-import aiomysql
 from discord.user import User as DiscordUser
 
 import pombot.lib.errors as errors
 import pombot.lib.pom_wars.errors as war_crimes
-from pombot.config import Config, Secrets
-from pombot.lib.types import Action, ActionType, DateRange, Event, Pom, SessionType
+from pombot.config import Config, Pomwars
+from pombot.lib import query_builder
+from pombot.lib.event_progress import EventProgress
+from pombot.lib.migrations import MIGRATIONS
+from pombot.lib.pom_wars.daily_actions import DailyActions
+from pombot.lib.query_builder import Aggregate, Filters
+from pombot.lib.storage_backends import StorageBackend, create_backend
+from pombot.lib.tiny_tools import daterange_from_timestamp
+from pombot.lib.types import (Action, ActionType, DateRange, Event, Pom, SessionType,
+                              TeamStats)
 from pombot.lib.types import User as PombotUser
+from pombot.lib.user_cache import UserCache
+from pombot.lib.write_buffer import WriteBuffer
 from pombot.state import State
 
 _log = logging.getLogger(__name__)
 
+# In-memory changes to undo should the ongoing Storage.transaction roll
+# back, or None outside of a transaction.
+_rollback_undos: ContextVar[Optional[List[Callable[[], None]]]] = ContextVar(
+    "rollback_undos", default=None)
+
+
+def _undo_on_rollback(undo: Callable[[], None]):
+    """Call `undo` if the ongoing transaction, if any, rolls back."""
+    if (undos := _rollback_undos.get()) is not None:
+        undos.append(undo)
 
-@asynccontextmanager
-async def _mysql_database_connection():
-    db_config = {
-        "db":       Secrets.MYSQL_DATABASE,
-        "host":     Secrets.MYSQL_HOST,
-        "user":     Secrets.MYSQL_USER,
-        "password": Secrets.MYSQL_PASSWORD,
-        "loop":     State.event_loop,
-        "charset":  "utf8",
-    }
-    connection: aiomysql.Connection = await aiomysql.connect(**db_config)
 
-    try:
-        yield connection
-    except aiomysql.Error:
-        await connection.rollback()
+def _forget_dropped_writes(user_ids: Set[int]):
+    """Forget what was counted from buffered rows which were never written."""
+    State.event_progress.invalidate()
 
-        # Handle error at callsite.
-        raise
-    else:
-        await connection.commit()
-    finally:
-        # aiomysql.Connection.close() returns None, not a coro.
-        connection.close()
+    for user_id in user_ids:
+        State.daily_actions.invalidate(user_id)
+        Storage.user_cache.invalidate(user_id)
 
 
 @asynccontextmanager
-async def _mysql_database_cursor():
-    async with _mysql_database_connection() as connection:
-        cursor: aiomysql.Cursor =  await connection.cursor()
+async def _database_cursor(unbuffered: bool = False):
+    async with Storage.backend.cursor(unbuffered) as cursor:
+        yield cursor
 
-        try:
-            yield cursor
-        finally:
-            await cursor.close()
 
+async def _flush_writes_of(user: Optional[DiscordUser]):
+    """Write the user's buffered inserts, if any, so that the next query
+    sees them.
+    """
+    buffer = Storage.write_buffer
+
+    if buffer is not None and user is not None and buffer.has_pending_for(user.id):
+        await buffer.flush()
+
+
+def _team_stats_delta(
+    team: str,
+    action_type: ActionType = None,
+    raw_damage: int = 0,
+    population: int = 0,
+) -> Tuple:
+    """Return the arguments of Storage.TEAM_STATS_DELTA_QUERY."""
+    return (
+        raw_damage,
+        int(action_type == ActionType.NORMAL_ATTACK),
+        int(action_type == ActionType.HEAVY_ATTACK),
+        int(action_type == ActionType.DEFEND),
+        int(action_type == ActionType.BRIBE),
+        population,
+        team,
+    )
+
+
+async def _stream_rows(query: str, args: List[Any], batch_size: int) -> AsyncIterator[Tuple]:
+    """Yield the rows of a query, holding at most one batch in memory.
+
+    The rows come from an unbuffered cursor, so the connection stays busy
+    until the iteration finishes; do not run other queries from within the
+    loop that consumes them.
+    """
+    async with _database_cursor(unbuffered=True) as cursor:
+        await cursor.execute(query, args)
+
+        while rows := await cursor.fetchmany(batch_size):
+            for row in rows:
+                yield row
+
+
+def _pom_filters(
+    user: DiscordUser = None,
+    descript: str = None,
+    date_range: DateRange = None,
+) -> Filters:
+    filters = Filters()
+
+    if user:
+        filters.equal("userID", user.id)
 
-def _replace_further_occurances(text: str, old: str, new: str) -> str:
-    try:
-        offset = text.index(old) + 1
-    except ValueError:
-        return text
+    if descript:
+        filters.equal("descript", descript)
 
-    return text[:offset] + text[offset:].replace(old, new)
+    if date_range:
+        filters.between("time_set", date_range.start_date, date_range.end_date)
 
+    return filters
 
-class Storage:
+
+def _action_filters(
+    action_type: ActionType = None,
+    user: DiscordUser = None,
+    team: str = None,
+    was_successful: bool = None,
+    date_range: DateRange = None,
+) -> Filters:
+    filters = Filters()
+
+    if action_type:
+        filters.equal("type", action_type.value)
+
+    if user:
+        filters.equal("userID", user.id)
+
+    if team:
+        filters.equal("team", team)
+
+    if was_successful:
+        filters.equal("was_successful", 1)
+
+    if date_range:
+        filters.between("time_set", date_range.start_date, date_range.end_date)
+
+    return filters
+
+
+class Storage:  # pylint: disable=too-many-public-methods
     """The global object-relational mapping."""
+    backend: StorageBackend = create_backend(Config.STORAGE_BACKEND)
+    write_buffer: Optional[WriteBuffer] = WriteBuffer(
+        backend,
+        Config.WRITE_BUFFER_FLUSH_INTERVAL_SECONDS,
+        Config.WRITE_BUFFER_MAX_ROWS,
+        Config.WRITE_BUFFER_MAX_ATTEMPTS,
+        on_drop=_forget_dropped_writes,
+    ) if Config.WRITE_BUFFER_ENABLED else None
+    user_cache = UserCache(Config.USER_CACHE_SIZE)
 
     TABLES = [
         {
@@ -126,29 +218,177 @@ class Storage:
                 );
             """
         },
+        {
+            # Running totals of the actions and users tables, so that the
+            # scoreboard need not scan them. Rebuilt by rebuild_team_stats.
+            "name": Config.TEAM_STATS_TABLE,
+            "create_query": f"""
+                CREATE TABLE IF NOT EXISTS {Config.TEAM_STATS_TABLE} (
+                    team VARCHAR(10) NOT NULL,
+                    damage BIGINT(20) NOT NULL DEFAULT 0,
+                    normal_attack_count INT(11) NOT NULL DEFAULT 0,
+                    heavy_attack_count INT(11) NOT NULL DEFAULT 0,
+                    defend_count INT(11) NOT NULL DEFAULT 0,
+                    bribe_count INT(11) NOT NULL DEFAULT 0,
+                    population INT(11) NOT NULL DEFAULT 0,
+                    PRIMARY KEY(team)
+                );
+            """
+        },
+        {
+            "name": Config.SCOREBOARD_MESSAGES_TABLE,
+            "create_query": f"""
+                CREATE TABLE IF NOT EXISTS {Config.SCOREBOARD_MESSAGES_TABLE} (
+                    channelID BIGINT(20) NOT NULL,
+                    messageID BIGINT(20) NOT NULL,
+                    PRIMARY KEY(channelID)
+                );
+            """
+        },
     ]
 
+    TEAM_STATS_DELTA_QUERY = f"""
+        UPDATE {Config.TEAM_STATS_TABLE}
+        SET damage=damage+%s,
+            normal_attack_count=normal_attack_count+%s,
+            heavy_attack_count=heavy_attack_count+%s,
+            defend_count=defend_count+%s,
+            bribe_count=bribe_count+%s,
+            population=population+%s
+        WHERE team=%s;
+    """
+
+    # Keep in step with User.after_action. MySQL assigns left to right, so
+    # miss_streak must be set before miss_streak_date.
+    USER_MISS_STREAK_QUERY = f"""
+        UPDATE {Config.USERS_TABLE}
+        SET miss_streak=CASE
+                WHEN %s THEN 0
+                WHEN miss_streak_date=%s THEN miss_streak+1
+                ELSE 1
+            END,
+            miss_streak_date=%s
+        WHERE userID=%s;
+    """
+
+    # Not part of TABLES so that deleting all rows does not forget which
+    # migrations were applied.
+    MIGRATIONS_TABLE = {
+        "name": Config.MIGRATIONS_TABLE,
+        "create_query": f"""
+            CREATE TABLE IF NOT EXISTS {Config.MIGRATIONS_TABLE} (
+                version INT(11) NOT NULL,
+                description VARCHAR(100) NOT NULL,
+                time_set TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY(version)
+            );
+        """
+    }
+
     @classmethod
     async def create_tables_if_not_exists(cls):
-        """Create predefined DB tables if they don't already exist."""
+        """Create predefined DB tables if they don't already exist, then
+        apply any pending schema migrations.
+        """
         # Tables are read first instead of purely relying on the "IF NOT
         # EXISTS" SQL syntax to avoid an unnecessary warning from aiomysql.
-        async with _mysql_database_cursor() as cursor:
-            await cursor.execute("SHOW TABLES")
-            existing_tables = await cursor.fetchall()
+        existing_table_names = await cls.backend.get_table_names()
 
-        existing_table_names = set(row[0] for row in existing_tables)
-        required_table_names = set(table["name"] for table in cls.TABLES)
+        tables = [*cls.TABLES, cls.MIGRATIONS_TABLE]
+        required_table_names = set(table["name"] for table in tables)
         names_of_tables_to_create = required_table_names - existing_table_names
 
         for table_to_create in names_of_tables_to_create:
             _log.info('Creating table: %s', table_to_create)
-            create_query = next(table["create_query"] for table in cls.TABLES
+            create_query = next(table["create_query"] for table in tables
                                 if table["name"] == table_to_create)
 
-            async with _mysql_database_cursor() as cursor:
+            async with _database_cursor() as cursor:
                 await cursor.execute(create_query)
 
+        await cls.apply_pending_migrations()
+
+        if Config.TEAM_STATS_TABLE in names_of_tables_to_create:
+            await cls.rebuild_team_stats()
+
+    @staticmethod
+    async def apply_pending_migrations():
+        """Apply, in order, the schema migrations which are not yet recorded
+        in the migrations table.
+        """
+        async with _database_cursor() as cursor:
+            await cursor.execute(f"SELECT version FROM {Config.MIGRATIONS_TABLE};")
+            applied_versions = {version for version, in await cursor.fetchall()}
+
+        record_query = f"""
+            INSERT INTO {Config.MIGRATIONS_TABLE} (
+                version,
+                description
+            )
+            VALUES (%s, %s);
+        """
+
+        for migration in MIGRATIONS:
+            if migration.version in applied_versions:
+                continue
+
+            _log.info("Applying migration %d: %s", migration.version,
+                      migration.description)
+
+            async with _database_cursor() as cursor:
+                for statement in migration.statements:
+                    await cursor.execute(statement)
+
+                await cursor.execute(record_query,
+                                     (migration.version, migration.description))
+
+    @classmethod
+    @asynccontextmanager
+    async def transaction(cls):
+        """Make every Storage call within the block part of one database
+        transaction, which commits only when the block exits normally.
+
+        Keep Discord calls out of the block: the connection, and on SQLite
+        the whole database, stays busy until the block exits.
+
+        >>> async with Storage.transaction():
+        ...     await Storage.add_poms_to_user_session(user, descript, 1)
+        ...     await Storage.add_pom_war_action(user, ...)
+        """
+        if cls.backend.in_transaction:
+            # Joined to the outer transaction, which undoes everything.
+            async with cls.backend.transaction():
+                yield
+            return
+
+        # Buffered rows cannot be written once the transaction is open, and
+        # reads within it must still see them.
+        if cls.write_buffer is not None:
+            await cls.write_buffer.flush()
+
+        undos = []
+        token = _rollback_undos.set(undos)
+
+        try:
+            async with cls.backend.transaction():
+                yield
+        except BaseException:
+            # Forget only what was counted or cached from the rolled back
+            # queries.
+            for undo in undos:
+                undo()
+            raise
+        finally:
+            _rollback_undos.reset(token)
+
+    @classmethod
+    async def close(cls):
+        """Write any buffered inserts and close the database."""
+        if cls.write_buffer is not None:
+            await cls.write_buffer.flush()
+
+        await cls.backend.close()
+
     @classmethod
     async def delete_all_rows_from_all_tables(cls):
         """Delete all rows from all tables.
@@ -157,13 +397,24 @@ class Storage:
         development machines.
         """
         _log.info("Deleting tables... ")
-        async with _mysql_database_cursor() as cursor:
+
+        if cls.write_buffer is not None:
+            await cls.write_buffer.flush()
+
+        async with _database_cursor() as cursor:
             for table_name in (table["name"] for table in cls.TABLES):
                 await cursor.execute(f"DELETE FROM {table_name};")
+
+        State.event_progress.invalidate()
+        State.defence_ledger.clear()
+        State.daily_actions.clear()
+        cls.user_cache.clear()
+        await cls.rebuild_team_stats()
         _log.info("Tables deleted.")
 
-    @staticmethod
+    @classmethod
     async def add_poms_to_user_session(
+        cls,
         user: DiscordUser,
         descript: str,
         count: int,
@@ -184,8 +435,14 @@ class Storage:
         time_set = time_set or dt.now()
         poms = [(user.id, descript, time_set, True) for _ in range(count)]
 
-        async with _mysql_database_cursor() as cursor:
-            await cursor.executemany(query, poms)
+        if cls.write_buffer is not None and not cls.backend.in_transaction:
+            await cls.write_buffer.add(user.id, query, poms)
+        else:
+            async with _database_cursor() as cursor:
+                await cursor.executemany(query, poms)
+
+        State.event_progress.add_poms(time_set, count)
+        _undo_on_rollback(State.event_progress.invalidate)
 
     @staticmethod
     async def bank_user_session_poms(user: DiscordUser) -> int:
@@ -199,7 +456,9 @@ class Storage:
             AND current_session = 1;
         """
 
-        async with _mysql_database_cursor() as cursor:
+        await _flush_writes_of(user)
+
+        async with _database_cursor() as cursor:
             rows_affected = await cursor.execute(query, (user.id, ))
 
         return rows_affected
@@ -221,25 +480,26 @@ class Storage:
         @param session Only remove poms from this session.
         @return Number of rows deleted.
         """
-        query = [f"DELETE FROM {Config.POMS_TABLE} WHERE userID=%s"]
-        args = [user.id]
+        await _flush_writes_of(user)
+
+        filters = Filters().equal("userID", user.id)
 
         if time_set:
-            query += ["WHERE time_set=%s"]
-            args += [time_set]
+            filters.equal("time_set", time_set)
 
         if session:
             if (not isinstance(session, SessionType) or
                     session not in [SessionType.CURRENT, SessionType.BANKED]):
                 raise RuntimeError("Invalid session type for removal.")
 
-            query += ["WHERE current_session=%s"]
-            args += [int(session == SessionType.CURRENT)]
+            filters.equal("current_session", int(session == SessionType.CURRENT))
 
-        query_str = _replace_further_occurances(" ".join(query), "WHERE", "AND")
+        async with _database_cursor() as cursor:
+            num_rows_removed = await cursor.execute(
+                *query_builder.delete(Config.POMS_TABLE, filters))
 
-        async with _mysql_database_cursor() as cursor:
-            num_rows_removed = await cursor.execute(query_str, args)
+        State.event_progress.remove_poms(time_set, num_rows_removed)
+        _undo_on_rollback(State.event_progress.invalidate)
 
         return num_rows_removed
 
@@ -254,7 +514,7 @@ class Storage:
 
         current_date = dt.now()
 
-        async with _mysql_database_cursor() as cursor:
+        async with _database_cursor() as cursor:
             await cursor.execute(query, (current_date, current_date))
             rows = await cursor.fetchall()
 
@@ -276,32 +536,50 @@ class Storage:
         @param limit Maximum length of the returned list.
         @return List of Pom objects.
         """
-        query = [f"SELECT * FROM {Config.POMS_TABLE}"]
-        args = []
+        query, args = query_builder.select(
+            Config.POMS_TABLE,
+            _pom_filters(user, descript, date_range),
+            order_by="time_set DESC" if limit else None,
+            limit=limit or None,
+        )
 
-        if user:
-            query += ["WHERE userID=%s"]
-            args += [user.id]
+        await _flush_writes_of(user)
 
-        if descript:
-            query += ["WHERE descript=%s"]
-            args += [descript]
+        async with _database_cursor() as cursor:
+            await cursor.execute(query, args)
+            rows = await cursor.fetchall()
 
-        if date_range:
-            query += ["WHERE time_set >= %s AND time_set <= %s"]
-            args += [date_range.start_date, date_range.end_date]
+        return [Pom(*row) for row in rows]
 
-        if limit:
-            query += ["ORDER BY time_set DESC LIMIT %s"]
-            args += [limit]
+    @staticmethod
+    async def iter_poms(
+        *,
+        user: DiscordUser = None,
+        descript = None,
+        date_range: DateRange = None,
+        batch_size: int = Config.STREAM_BATCH_SIZE,
+    ) -> AsyncIterator[Pom]:
+        """Iterate over the poms matching certain criteria without loading
+        all of them into memory, oldest first.
 
-        query_str = _replace_further_occurances(" ".join(query), "WHERE", "AND")
+        Prefer this over get_poms for reports and exports over many users or
+        a long date range. No other Storage calls should be made until the
+        iteration is finished.
 
-        async with _mysql_database_cursor() as cursor:
-            await cursor.execute(query_str, args)
-            rows = await cursor.fetchall()
+        @param user Only match poms for this user.
+        @param date_range Only match poms within this date range.
+        @param batch_size Number of poms fetched from the database at once.
+        """
+        query, args = query_builder.select(
+            Config.POMS_TABLE,
+            _pom_filters(user, descript, date_range),
+            order_by="time_set",
+        )
 
-        return [Pom(*row) for row in rows]
+        await _flush_writes_of(user)
+
+        async for row in _stream_rows(query, args, batch_size):
+            yield Pom(*row)
 
     @staticmethod
     async def add_new_event(name: str, goal: int, date_range: DateRange):
@@ -317,15 +595,17 @@ class Storage:
         """
         args = name, goal, date_range.start_date, date_range.end_date
 
-        async with _mysql_database_cursor() as cursor:
+        async with _database_cursor() as cursor:
             try:
                 await cursor.execute(query, args)
-            except aiomysql.DataError as exc:
+            except Storage.backend.DataError as exc:
                 # Give a nicer error message than the mysql default. This has
                 # been tested to handle "event name too long" and "pom_goal"
                 # out of range.
                 raise errors.EventCreationError(exc.args[-1]) from exc
 
+        State.event_progress.invalidate()
+
     @staticmethod
     async def get_all_events() -> List[Event]:
         """Return a list of all events."""
@@ -335,12 +615,80 @@ class Storage:
             ORDER BY start_date;
         """
 
-        async with _mysql_database_cursor() as cursor:
+        async with _database_cursor() as cursor:
             await cursor.execute(query)
             rows = await cursor.fetchall()
 
         return [Event(*row) for row in rows]
 
+    @classmethod
+    async def get_event_progress(cls) -> EventProgress:
+        """Return the pom count of the ongoing event, seeding it from the
+        database only when it is not yet known or has expired.
+
+        The count expires after EVENT_PROGRESS_MAX_AGE_SECONDS so that poms
+        added by other bot processes are counted. Poms stored while the count
+        is being seeded may be counted twice or not at all; the count is
+        exact again once it is next seeded.
+
+        @raises TooManyEventsError when more than one event is ongoing.
+        """
+        progress: EventProgress = State.event_progress
+        now = dt.now()
+
+        if progress.is_valid_at(now):
+            return progress
+
+        stale_at = now + timedelta(seconds=Config.EVENT_PROGRESS_MAX_AGE_SECONDS)
+
+        # Buffered poms would otherwise be missing from the count.
+        if cls.write_buffer is not None:
+            await cls.write_buffer.flush()
+
+        events = await cls.get_all_events()
+        ongoing_events = [e for e in events if e.start_date <= now <= e.end_date]
+        next_starts = [e.start_date for e in events if now < e.start_date]
+
+        try:
+            ongoing_event, *other_ongoing_events = ongoing_events
+        except ValueError:
+            progress.seed(None, 0, min([*next_starts, stale_at]))
+            return progress
+
+        if any(other_ongoing_events):
+            msg = "Only one ongoing event supported."
+            raise errors.TooManyEventsError(msg)
+
+        # The poms of an event which already reached its goal don't matter.
+        num_poms = 0 if ongoing_event.goal_reached else await cls.count_poms(
+            date_range=DateRange(ongoing_event.start_date, ongoing_event.end_date))
+        progress.seed(ongoing_event, num_poms, min(ongoing_event.end_date, stale_at))
+
+        return progress
+
+    @staticmethod
+    async def mark_event_goal_reached(event: Event) -> bool:
+        """Mark the event as having reached its goal.
+
+        The flag is only ever set once, even with several bot processes
+        sharing the database.
+
+        @return Whether this call was the one to set the flag.
+        """
+        query = f"""
+            UPDATE {Config.EVENTS_TABLE}
+            SET goal_reached=1
+            WHERE id=%s
+            AND goal_reached=0;
+        """
+
+        async with _database_cursor() as cursor:
+            rows_affected = await cursor.execute(query, (event.event_id, ))
+
+        State.event_progress.mark_goal_reached(event)
+
+        return rows_affected == 1
+
     @staticmethod
     async def get_overlapping_events(date_range: DateRange) -> List[Event]:
         """Return a list of events in the database which overlap with the
@@ -353,7 +701,7 @@ class Storage:
             AND %s > start_date;
         """
 
-        async with _mysql_database_cursor() as cursor:
+        async with _database_cursor() as cursor:
             await cursor.execute(query, (date_range.start_date, date_range.end_date))
             rows = await cursor.fetchall()
 
@@ -362,15 +710,26 @@ class Storage:
     @staticmethod
     async def delete_event(name: str):
         """Delete the named event from the DB."""
-        query = f"""
-            DELETE FROM {Config.EVENTS_TABLE}
+        # Not every backend supports ORDER BY and LIMIT on a DELETE, so find
+        # the earliest matching event first.
+        select_query = f"""
+            SELECT id FROM {Config.EVENTS_TABLE}
             WHERE event_name=%s
             ORDER BY start_date
             LIMIT 1;
         """
+        delete_query = f"""
+            DELETE FROM {Config.EVENTS_TABLE}
+            WHERE id=%s;
+        """
+
+        async with _database_cursor() as cursor:
+            await cursor.execute(select_query, (name, ))
+
+            if row := await cursor.fetchone():
+                await cursor.execute(delete_query, row)
 
-        async with _mysql_database_cursor() as cursor:
-            await cursor.execute(query, (name, ))
+        State.event_progress.invalidate()
 
     @classmethod
     async def add_user(cls, user_id: str, zone: timezone, team: str):
@@ -386,15 +745,20 @@ class Storage:
 
         zone_str = time(tzinfo=zone).strftime('%z')
 
-        async with _mysql_database_cursor() as cursor:
-            try:
+        cls.user_cache.invalidate(user_id)
+
+        try:
+            async with cls.transaction(), _database_cursor() as cursor:
                 await cursor.execute(query, (user_id, zone_str, team))
-            except aiomysql.IntegrityError as exc:
-                user = await cls.get_user_by_id(user_id)
-                raise war_crimes.UserAlreadyExistsError(user.team) from exc
+                await cursor.execute(cls.TEAM_STATS_DELTA_QUERY,
+                                     _team_stats_delta(team, population=1))
+        except cls.backend.IntegrityError as exc:
+            # Look the user up only after the failed connection is released.
+            user = await cls.get_user_by_id(user_id)
+            raise war_crimes.UserAlreadyExistsError(user.team) from exc
 
-    @staticmethod
-    async def set_user_timezone(user_id: str, zone: timezone):
+    @classmethod
+    async def set_user_timezone(cls, user_id: str, zone: timezone):
         """Set the user timezone."""
         query = f"""
             UPDATE {Config.USERS_TABLE}
@@ -404,11 +768,13 @@ class Storage:
 
         zone_str = time(tzinfo=zone).strftime('%z')
 
-        async with _mysql_database_cursor() as cursor:
+        async with _database_cursor() as cursor:
             await cursor.execute(query, (zone_str, user_id))
 
-    @staticmethod
-    async def update_user_team(user_id: str, team: str):
+        cls.user_cache.invalidate(user_id)
+
+    @classmethod
+    async def update_user_team(cls, user_id: str, team: str):
         """Set the user team."""
         query = f"""
             UPDATE {Config.USERS_TABLE}
@@ -416,9 +782,22 @@ class Storage:
             WHERE userID=%s
         """
 
-        async with _mysql_database_cursor() as cursor:
+        try:
+            old_team = (await cls.get_user_by_id(user_id)).team
+        except war_crimes.UserDoesNotExistError:
+            old_team = None
+
+        async with cls.transaction(), _database_cursor() as cursor:
             await cursor.execute(query, (team, user_id))
 
+            if old_team is not None and old_team != team:
+                await cursor.executemany(cls.TEAM_STATS_DELTA_QUERY, [
+                    _team_stats_delta(old_team, population=-1),
+                    _team_stats_delta(team, population=1),
+                ])
+
+        cls.user_cache.invalidate(user_id)
+
     @staticmethod
     async def update_user_poms_descriptions(
         user: DiscordUser,
@@ -444,30 +823,43 @@ class Storage:
         if session_poms_only:
             query += "AND current_session=1"
 
-        async with _mysql_database_cursor() as cursor:
+        await _flush_writes_of(user)
+
+        async with _database_cursor() as cursor:
             rows_affected = await cursor.execute(query, (new_description, user.id, old_description))
 
         return rows_affected
 
-    @staticmethod
-    async def get_user_by_id(user_id: int) -> Optional[PombotUser]:
+    @classmethod
+    async def get_user_by_id(cls, user_id: int) -> Optional[PombotUser]:
         """Return a single user by its userID."""
+        if user := cls.user_cache.get(user_id):
+            return user
+
         query = f"""
             SELECT * FROM {Config.USERS_TABLE}
             WHERE userID=%s;
         """
 
-        async with _mysql_database_cursor() as cursor:
+        # Buffered actions also update their user's row.
+        if cls.write_buffer is not None and cls.write_buffer.has_pending_for(int(user_id)):
+            await cls.write_buffer.flush()
+
+        async with _database_cursor() as cursor:
             await cursor.execute(query, (user_id,))
             row = await cursor.fetchone()
 
         if not row:
             raise war_crimes.UserDoesNotExistError()
 
-        return PombotUser(*row)
+        user = PombotUser(*row)
+        cls.user_cache.put([user])
+        _undo_on_rollback(partial(cls.user_cache.invalidate, user.user_id))
 
-    @staticmethod
-    async def get_users_by_id(user_ids: List[int]) -> Set[PombotUser]:
+        return user
+
+    @classmethod
+    async def get_users_by_id(cls, user_ids: List[int]) -> Set[PombotUser]:
         """Return a list of users from a list of userID's.
 
         This is a small optimization function to call the storage a single
@@ -477,23 +869,52 @@ class Storage:
         if not user_ids:
             return []
 
-        query = [f"SELECT * FROM {Config.USERS_TABLE}"]
-        values = []
+        users = set()
+        uncached_user_ids = set()
+
+        for user_id in set(user_ids):
+            if user := cls.user_cache.get(user_id):
+                users.add(user)
+            else:
+                uncached_user_ids.add(user_id)
 
-        for user_id in user_ids:
-            query += ["WHERE userID=%s"]
-            values += [user_id]
+        if not uncached_user_ids:
+            return users
 
-        query_str = _replace_further_occurances(" ".join(query), "WHERE", "OR")
+        query, values = query_builder.select(
+            Config.USERS_TABLE, Filters().one_of("userID", sorted(uncached_user_ids)))
 
-        async with _mysql_database_cursor() as cursor:
-            await cursor.execute(query_str, values)
+        async with _database_cursor() as cursor:
+            await cursor.execute(query, values)
             rows = await cursor.fetchall()
 
-        return {PombotUser(*r) for r in rows}
+        uncached_users = {PombotUser(*r) for r in rows}
+        cls.user_cache.put(uncached_users)
 
-    @staticmethod
+        for user in uncached_users:
+            _undo_on_rollback(partial(cls.user_cache.invalidate, user.user_id))
+
+        return users | uncached_users
+
+    @classmethod
+    async def warm_user_cache(cls) -> int:
+        """Fill the user cache from the users table and return the number
+        of users cached.
+        """
+        query, values = query_builder.select(
+            Config.USERS_TABLE, limit=cls.user_cache.max_size)
+
+        async with _database_cursor() as cursor:
+            await cursor.execute(query, values)
+            rows = await cursor.fetchall()
+
+        cls.user_cache.put(PombotUser(*r) for r in rows)
+
+        return len(cls.user_cache)
+
+    @classmethod
     async def add_pom_war_action(
+        cls,
         user: DiscordUser,
         team: str,
         action_type: ActionType,
@@ -517,11 +938,31 @@ class Storage:
             )
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s);
         """
+        raw_damage = (damage or 0) * 100
         values = (user.id, team, action_type.value, was_successful,
-                  was_critical, items_dropped, (damage or 0) * 100, time_set)
-
-        async with _mysql_database_cursor() as cursor:
-            await cursor.execute(query, values)
+                  was_critical, items_dropped, raw_damage, time_set)
+        stats_delta = _team_stats_delta(team, action_type, raw_damage)
+        day = time_set.date()
+        miss_streak_values = (was_successful, day, day, user.id)
+
+        # The buffer writes every statement in the same transaction.
+        if cls.write_buffer is not None and not cls.backend.in_transaction:
+            await cls.write_buffer.add(user.id, query, [values])
+            await cls.write_buffer.add(user.id, cls.TEAM_STATS_DELTA_QUERY, [stats_delta])
+            await cls.write_buffer.add(user.id, cls.USER_MISS_STREAK_QUERY,
+                                       [miss_streak_values])
+        else:
+            async with cls.transaction(), _database_cursor() as cursor:
+                await cursor.execute(query, values)
+                await cursor.execute(cls.TEAM_STATS_DELTA_QUERY, stats_delta)
+                await cursor.execute(cls.USER_MISS_STREAK_QUERY, miss_streak_values)
+
+        State.daily_actions.add(user.id, day, was_successful)
+        _undo_on_rollback(partial(State.daily_actions.invalidate, user.id))
+
+        if cached_user := cls.user_cache.peek(user.id):
+            cls.user_cache.put([cached_user.after_action(day, was_successful)])
+            _undo_on_rollback(partial(cls.user_cache.invalidate, user.id))
 
     @staticmethod
     async def get_actions(
@@ -535,94 +976,331 @@ class Storage:
         """Get a list of actions from storage matching certain criteria.
 
         This function has the potential to return a large list of actions, so
-        it is recommended to provide a date_range.
+        it is recommended to provide a date_range, or to use iter_actions.
 
         @param user Only match actions for this user.
         @param date_range Only match actions within this date range.
         @return List of Action objects.
         """
-        query = [f"SELECT * FROM {Config.ACTIONS_TABLE}"]
-        values = []
+        filters = _action_filters(action_type, user, team, was_successful, date_range)
 
-        if action_type:
-            query += [f"WHERE type=%s"]
-            values += [action_type.value]
+        await _flush_writes_of(user)
 
-        if user:
-            query += [f"WHERE userID=%s"]
-            values += [user.id]
+        async with _database_cursor() as cursor:
+            await cursor.execute(*query_builder.select(Config.ACTIONS_TABLE, filters))
+            rows = await cursor.fetchall()
 
-        if team:
-            query += [f"WHERE team=%s"]
-            values += [team]
+        return [Action(*row) for row in rows]
 
-        if was_successful:
-            query += [f"WHERE was_successful=%s"]
-            values += [1]
+    @classmethod
+    async def get_daily_actions(cls, user: DiscordUser, timestamp: dt) -> DailyActions:
+        """Get the number of actions the user made on the day of the
+        timestamp, and how many of the latest ones in a row were
+        unsuccessful.
 
-        if date_range:
-            query += ["WHERE time_set >= %s", "AND time_set <= %s"]
-            values += [date_range.start_date, date_range.end_date]
+        The actions are counted in the database once per user and day, and
+        kept up to date by add_pom_war_action afterwards. The misses are
+        kept on the user's row.
 
-        query_str = _replace_further_occurances(" ".join(query), "WHERE", "AND")
+        Raises:
+            UserDoesNotExistError when the user has not joined Pom Wars.
+        """
+        day = timestamp.date()
 
-        async with _mysql_database_cursor() as cursor:
-            await cursor.execute(query_str, values)
-            rows = await cursor.fetchall()
+        if actions := State.daily_actions.get(user.id, day):
+            return actions
 
-        return [Action(*row) for row in rows]
+        query, values = query_builder.select(
+            Config.ACTIONS_TABLE,
+            _action_filters(user=user, date_range=daterange_from_timestamp(timestamp)),
+            columns=query_builder.aggregate(Aggregate.COUNT),
+        )
+
+        await _flush_writes_of(user)
+        botuser = await cls.get_user_by_id(user.id)
+
+        async with _database_cursor() as cursor:
+            await cursor.execute(query, values)
+            count, = await cursor.fetchone()
+
+        actions = DailyActions(int(count), botuser.misses_on(day))
+        State.daily_actions.seed(user.id, day, actions)
+        _undo_on_rollback(partial(State.daily_actions.invalidate, user.id))
+
+        return actions
+
+    @staticmethod
+    async def iter_actions(
+        *,
+        action_type: ActionType = None,
+        user: DiscordUser = None,
+        team: str = None,
+        was_successful = None,
+        date_range: DateRange = None,
+        batch_size: int = Config.STREAM_BATCH_SIZE,
+    ) -> AsyncIterator[Action]:
+        """Iterate over the actions matching certain criteria without loading
+        all of them into memory, oldest first.
+
+        No other Storage calls should be made until the iteration is
+        finished.
+
+        @param user Only match actions for this user.
+        @param date_range Only match actions within this date range.
+        @param batch_size Number of actions fetched from the database at once.
+        """
+        query, args = query_builder.select(
+            Config.ACTIONS_TABLE,
+            _action_filters(action_type, user, team, was_successful, date_range),
+            order_by="time_set",
+        )
+
+        await _flush_writes_of(user)
+
+        async for row in _stream_rows(query, args, batch_size):
+            yield Action(*row)
 
     @staticmethod
-    async def count_rows_in_table(
+    async def _aggregate(
         table: str,
+        function: Aggregate,
+        column: str,
+        filters: Filters,
+    ) -> Union[int, float]:
+        query, args = query_builder.select(
+            table, filters, columns=query_builder.aggregate(function, column))
+
+        async with _database_cursor() as cursor:
+            await cursor.execute(query, args)
+            value, = await cursor.fetchone()
+
+        # Aggregating no rows gives NULL, and MySQL sums into a Decimal.
+        if value is None:
+            return 0
+
+        return float(value) if function == Aggregate.AVG else int(value)
+
+    @classmethod
+    async def aggregate_poms(
+        cls,
+        function: Aggregate,
+        column: str = "1",
+        *,
+        user: DiscordUser = None,
+        descript: str = None,
+        date_range: DateRange = None,
+    ) -> Union[int, float]:
+        """Compute an aggregate over the poms matching certain criteria,
+        without fetching the poms themselves.
+
+        @param function Aggregate function to apply.
+        @param column Column to aggregate, or "1" to count rows.
+        @param user Only match poms for this user.
+        @param descript Only match poms with this description.
+        @param date_range Only match poms within this date range.
+        @return The aggregate value; 0 when no poms match.
+        """
+        filters = _pom_filters(user, descript, date_range)
+
+        await _flush_writes_of(user)
+
+        return await cls._aggregate(Config.POMS_TABLE, function, column, filters)
+
+    @classmethod
+    async def aggregate_actions(
+        cls,
+        function: Aggregate,
+        column: str = "1",
         *,
         action_type: ActionType = None,
+        user: DiscordUser = None,
         team: str = None,
-    ) -> int:
-        """Get number of users on a team.
+        was_successful: bool = None,
+        date_range: DateRange = None,
+    ) -> Union[int, float]:
+        """Compute an aggregate over the actions matching certain criteria,
+        without fetching the actions themselves.
+
+        @param function Aggregate function to apply.
+        @param column Column to aggregate, or "1" to count rows.
+        @param user Only match actions for this user.
+        @param date_range Only match actions within this date range.
+        @return The aggregate value; 0 when no actions match.
+        """
+        filters = _action_filters(action_type, user, team, was_successful, date_range)
+
+        await _flush_writes_of(user)
+
+        return await cls._aggregate(Config.ACTIONS_TABLE, function, column, filters)
+
+    @classmethod
+    async def count_poms(cls, **filters) -> int:
+        """Count the poms matching the same criteria as `get_poms`."""
+        return await cls.aggregate_poms(Aggregate.COUNT, **filters)
+
+    @classmethod
+    async def count_actions(cls, **filters) -> int:
+        """Count the actions matching the same criteria as `get_actions`."""
+        return await cls.aggregate_actions(Aggregate.COUNT, **filters)
+
+    @staticmethod
+    async def get_team_stats(team: str) -> TeamStats:
+        """Get the running totals of a team.
 
         The team parameter is a string here to avoid a circular reference.
 
-        @param table The table from which to count.
-        @param action_type Consider only these types of actions.
         @param team Team name as a string.
-        @return Count of users on this team.
+        @return The team's stats, all zero when the team has none yet.
         """
-        query = [f"SELECT COUNT(1) FROM {table}"]
-        values = []
+        query, values = query_builder.select(
+            Config.TEAM_STATS_TABLE, Filters().equal("team", team))
 
-        if action_type:
-            query += [f"WHERE type=%s"]
-            values += [action_type.value]
+        async with _database_cursor() as cursor:
+            await cursor.execute(query, values)
+            row = await cursor.fetchone()
 
-        if team:
-            query += [f"WHERE team=%s"]
-            values += [team]
+        return TeamStats(*row) if row else TeamStats(team, 0, 0, 0, 0, 0, 0)
 
-        query_str = _replace_further_occurances(" ".join(query), "WHERE", "AND")
+    @staticmethod
+    async def get_all_team_stats() -> Dict[str, TeamStats]:
+        """Get the running totals of every team in a single query.
 
-        async with _mysql_database_cursor() as cursor:
-            await cursor.execute(query_str, values)
-            row, = await cursor.fetchone()
+        @return Mapping of team names to their stats. Configured teams
+            without stats yet are included, with all stats zero.
+        """
+        async with _database_cursor() as cursor:
+            await cursor.execute(*query_builder.select(Config.TEAM_STATS_TABLE))
+            rows = await cursor.fetchall()
 
-        return int(row)
+        return {
+            **{team: TeamStats(team, 0, 0, 0, 0, 0, 0)
+               for team in (Pomwars.KNIGHT_ROLE, Pomwars.VIKING_ROLE)},
+            **{row[0]: TeamStats(*row) for row in rows},
+        }
 
     @staticmethod
-    async def sum_team_damage(team: str) -> int:
-        """Get sum of the damage column for a team.
+    async def get_team_summary() -> Dict[str, TeamStats]:
+        """Compute the stats of every team from the actions and users
+        tables, in one grouped query over each.
 
-        The team parameter is a string here to avoid a circular reference.
+        Unlike get_all_team_stats, this scans the ledger; it is meant for
+        rebuilding and checking the running totals.
 
-        @param team Team name as a string.
-        @return Sum of the damage that the team has done thus far.
+        @return Mapping of team names to their stats. Configured teams
+            without any actions or users are included, with all stats zero.
         """
-        query = f"""
-            SELECT SUM(damage) FROM {Config.ACTIONS_TABLE}
-            WHERE team=%s;
+        actions_query = f"""
+            SELECT team, type, COUNT(1), SUM(damage)
+            FROM {Config.ACTIONS_TABLE}
+            GROUP BY team, type;
+        """
+        users_query = f"""
+            SELECT team, COUNT(1)
+            FROM {Config.USERS_TABLE}
+            GROUP BY team;
+        """
+        fields = [field.name for field in dataclasses.fields(TeamStats)][1:]
+        teams = {team: dict.fromkeys(fields, 0)
+                 for team in (Pomwars.KNIGHT_ROLE, Pomwars.VIKING_ROLE)}
+
+        async with _database_cursor() as cursor:
+            await cursor.execute(actions_query)
+
+            for team, action_type, count, raw_damage in await cursor.fetchall():
+                stats = teams.setdefault(team, dict.fromkeys(fields, 0))
+                stats["raw_damage"] += int(raw_damage or 0)
+                stats[f"{ActionType(action_type).value}_count"] += count
+
+            await cursor.execute(users_query)
+
+            for team, population in await cursor.fetchall():
+                teams.setdefault(team, dict.fromkeys(fields, 0))["population"] = population
+
+        return {team: TeamStats(team, **stats) for team, stats in teams.items()}
+
+    @classmethod
+    async def rebuild_team_stats(cls):
+        """Recompute the team_stats table from the actions and users tables.
+
+        Every configured team gets a row, even before it has any actions or
+        users, so that later deltas always have a row to update.
+        """
+        insert_query = f"""
+            INSERT INTO {Config.TEAM_STATS_TABLE} (
+                team,
+                damage,
+                normal_attack_count,
+                heavy_attack_count,
+                defend_count,
+                bribe_count,
+                population
+            )
+            VALUES (%s, %s, %s, %s, %s, %s, %s);
+        """
+
+        async with cls.transaction():
+            summary = await cls.get_team_summary()
+
+            async with _database_cursor() as cursor:
+                await cursor.execute(f"DELETE FROM {Config.TEAM_STATS_TABLE};")
+                await cursor.executemany(insert_query, [
+                    dataclasses.astuple(stats) for stats in summary.values()
+                ])
+
+        _log.info("Team stats rebuilt for teams: %s", ", ".join(summary))
+
+    @classmethod
+    async def rebuild_defence_ledger(cls):
+        """Refill State.defence_ledger with the successful defends which
+        still protect their teams.
         """
+        now = dt.now()
+        defends = await cls.get_actions(
+            action_type=ActionType.DEFEND,
+            was_successful=True,
+            date_range=DateRange(
+                now - timedelta(minutes=Pomwars.DEFEND_DURATION_MINUTES),
+                now,
+            ),
+        )
+        defenders = {
+            defender.user_id: defender
+            for defender in await cls.get_users_by_id([a.user_id for a in defends])
+        }
+
+        State.defence_ledger.clear()
+
+        for defend in sorted(defends, key=lambda defend: defend.timestamp):
+            defend_level = defenders[defend.user_id].defend_level
+            State.defence_ledger.add(
+                defend.team,
+                defend.user_id,
+                defend.timestamp,
+                Pomwars.DEFEND_LEVEL_MULTIPLIERS[defend_level],
+            )
 
-        async with _mysql_database_cursor() as cursor:
-            await cursor.execute(query, (team,))
-            row, = await cursor.fetchone()
+    @staticmethod
+    async def get_scoreboard_message_ids() -> Dict[int, int]:
+        """Return the IDs of the scoreboard messages, by channel ID."""
+        async with _database_cursor() as cursor:
+            await cursor.execute(*query_builder.select(Config.SCOREBOARD_MESSAGES_TABLE))
+            rows = await cursor.fetchall()
+
+        return dict(rows)
+
+    @classmethod
+    async def set_scoreboard_message_id(cls, channel_id: int, message_id: int):
+        """Remember the ID of the scoreboard message in a channel."""
+        delete_query, delete_values = query_builder.delete(
+            Config.SCOREBOARD_MESSAGES_TABLE, Filters().equal("channelID", channel_id))
+        insert_query = f"""
+            INSERT INTO {Config.SCOREBOARD_MESSAGES_TABLE} (
+                channelID,
+                messageID
+            )
+            VALUES (%s, %s);
+        """
 
-        return int(row or 0)
+        async with cls.transaction(), _database_cursor() as cursor:
+            await cursor.execute(delete_query, delete_values)
+            await cursor.execute(insert_query, (channel_id, message_id))
@@ -0,0 +1,377 @@
+"""Databases which Storage can run its queries against.
+
+Storage writes its queries for MySQL. Other backends translate those queries
+where the dialects differ, so that adding a backend never means rewriting
+the queries in Storage.
+"""
+import asyncio
+import logging
+import re
+import sqlite3
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from datetime import date, datetime
+from typing import Any, Iterable, Optional, Set
+
+import aiomysql
+
+from pombot.config import Config, Secrets
+from pombot.state import State
+
+_log = logging.getLogger(__name__)
+
+
+class StorageBackend(ABC):
+    """A database connection provider used by Storage.
+
+    Cursors yielded by a backend behave like aiomysql cursors: queries use
+    the "%s" paramstyle and `execute` returns the number of affected rows.
+    """
+    Error = Exception
+    IntegrityError = Exception
+    DataError = Exception
+
+    def __init__(self):
+        self._transaction_connection: ContextVar[Optional[Any]] = ContextVar(
+            f"{type(self).__name__}_transaction_connection", default=None)
+
+    @property
+    def in_transaction(self) -> bool:
+        """Whether the current task is inside a `transaction` block."""
+        return self._transaction_connection.get() is not None
+
+    async def open(self):
+        """Prepare the backend once the event loop is running."""
+
+    async def close(self):
+        """Release all resources held by the backend."""
+
+    @abstractmethod
+    async def get_table_names(self) -> Set[str]:
+        """Return the names of the tables which exist in the database."""
+
+    @abstractmethod
+    def _connect(self):
+        """Async context manager yielding a raw database connection."""
+
+    @abstractmethod
+    async def _open_cursor(self, connection: Any, unbuffered: bool = False):
+        """Return a new cursor on the raw connection.
+
+        An unbuffered cursor leaves the result set on the database server
+        and fetches rows only as they are asked for.
+        """
+
+    @asynccontextmanager
+    async def transaction(self):
+        """Run every query made by the current task within the block on one
+        connection, committed once when the block exits normally and rolled
+        back when it raises.
+
+        A transaction within a transaction joins the outer one. Tasks
+        created within the block inherit the connection, so they must not
+        run queries concurrently with it.
+        """
+        if self.in_transaction:
+            yield
+            return
+
+        async with self._connect() as connection:
+            token = self._transaction_connection.set(connection)
+
+            try:
+                yield
+            except BaseException:
+                await connection.rollback()
+                raise
+            else:
+                await connection.commit()
+            finally:
+                self._transaction_connection.reset(token)
+
+    @asynccontextmanager
+    async def connection(self):
+        """Yield a connection which is committed when the block exits
+        normally, and rolled back on database errors.
+
+        Within a transaction, the transaction's connection is yielded
+        instead and left for the transaction to commit.
+        """
+        if (connection := self._transaction_connection.get()) is not None:
+            yield connection
+            return
+
+        async with self._connect() as connection:
+            try:
+                yield connection
+            except self.Error:
+                await connection.rollback()
+
+                # Handle error at callsite.
+                raise
+
+            await connection.commit()
+
+    @asynccontextmanager
+    async def cursor(self, unbuffered: bool = False):
+        """Yield a cursor on a new connection.
+
+        @param unbuffered Stream the result set instead of loading all of it
+            into memory on execute. The connection is not available to any
+            other query until the cursor is closed.
+        """
+        async with self.connection() as connection:
+            cursor = await self._open_cursor(connection, unbuffered)
+
+            try:
+                yield cursor
+            finally:
+                await cursor.close()
+
+
+class MySQLBackend(StorageBackend):
+    """MySQL via aiomysql, pooled once `open` has been called."""
+    Error = aiomysql.Error
+    IntegrityError = aiomysql.IntegrityError
+    DataError = aiomysql.DataError
+
+    @staticmethod
+    def _connection_config() -> dict:
+        return {
+            "db":       Secrets.MYSQL_DATABASE,
+            "host":     Secrets.MYSQL_HOST,
+            "user":     Secrets.MYSQL_USER,
+            "password": Secrets.MYSQL_PASSWORD,
+            "loop":     State.event_loop,
+            "charset":  "utf8",
+        }
+
+    async def open(self):
+        """Create the pool of connections shared by all Storage calls.
+
+        on_ready can fire again after a reconnect, in which case the existing
+        pool is kept.
+        """
+        if State.db_pool is None:
+            State.db_pool = await aiomysql.create_pool(
+                minsize=Config.MYSQL_POOL_MIN_SIZE,
+                maxsize=Config.MYSQL_POOL_MAX_SIZE,
+                pool_recycle=Config.MYSQL_POOL_RECYCLE_SECONDS,
+                **self._connection_config(),
+            )
+
+    async def close(self):
+        """Close the pool and wait for borrowed connections to return."""
+        if State.db_pool is not None:
+            State.db_pool.close()
+            await State.db_pool.wait_closed()
+            State.db_pool = None
+
+    async def get_table_names(self) -> Set[str]:
+        async with self.cursor() as cursor:
+            await cursor.execute("SHOW TABLES")
+            rows = await cursor.fetchall()
+
+        return {row[0] for row in rows}
+
+    def _connect(self):
+        # The pool only exists after on_ready; unit tests and scripts which
+        # use Storage directly get a fresh connection instead.
+        if State.db_pool is not None:
+            return self._pooled_connection()
+
+        return self._unpooled_connection()
+
+    @asynccontextmanager
+    async def _pooled_connection(self):
+        pool: aiomysql.Pool = State.db_pool
+        connection: aiomysql.Connection = await asyncio.wait_for(
+            pool.acquire(), timeout=Config.MYSQL_POOL_ACQUIRE_TIMEOUT_SECONDS)
+
+        try:
+            yield connection
+        finally:
+            # A connection released mid-transaction is closed by the pool
+            # rather than handed to the next borrower.
+            await pool.release(connection)
+
+    @asynccontextmanager
+    async def _unpooled_connection(self):
+        connection: aiomysql.Connection = await aiomysql.connect(
+            **self._connection_config())
+
+        try:
+            yield connection
+        finally:
+            # aiomysql.Connection.close() returns None, not a coro.
+            connection.close()
+
+    async def _open_cursor(
+        self,
+        connection: aiomysql.Connection,
+        unbuffered: bool = False,
+    ) -> aiomysql.Cursor:
+        if unbuffered:
+            return await connection.cursor(aiomysql.SSCursor)
+
+        return await connection.cursor()
+
+
+# Store timestamps the same way MySQL displays them, and read them back as
+# the same types that aiomysql returns.
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_converter("TIMESTAMP", lambda raw: datetime.fromisoformat(raw.decode()))
+sqlite3.register_converter("DATE", lambda raw: date.fromisoformat(raw.decode()))
+
+
+class _SQLiteCursor:
+    """A sqlite3 cursor which accepts and behaves like aiomysql queries.
+
+    SQLite runs in-process, so queries are executed directly instead of
+    being handed to another thread.
+    """
+    TRANSLATIONS = (
+        (re.compile(r"%s"), "?"),
+        (re.compile(r"\bINT\(\d+\) NOT NULL AUTO_INCREMENT\b"), "INTEGER NOT NULL"),
+    )
+
+    def __init__(self, cursor: sqlite3.Cursor):
+        self._cursor = cursor
+
+    @classmethod
+    def translate(cls, query: str) -> str:
+        """Rewrite a MySQL query into its SQLite equivalent."""
+        for pattern, replacement in cls.TRANSLATIONS:
+            query = pattern.sub(replacement, query)
+
+        return query
+
+    async def execute(self, query: str, args: Optional[Iterable] = None) -> int:
+        """Execute a query and return the number of affected rows."""
+        self._cursor.execute(self.translate(query), tuple(args or ()))
+        return self._cursor.rowcount
+
+    async def executemany(self, query: str, args: Iterable[Iterable]) -> int:
+        """Execute a query once per set of args and return the number of
+        affected rows.
+        """
+        self._cursor.executemany(self.translate(query), [tuple(a) for a in args])
+        return self._cursor.rowcount
+
+    async def fetchone(self):
+        """Return the next row, or None when there are no more."""
+        return self._cursor.fetchone()
+
+    async def fetchmany(self, size: int):
+        """Return up to `size` of the next rows."""
+        return self._cursor.fetchmany(size)
+
+    async def fetchall(self):
+        """Return all remaining rows."""
+        return self._cursor.fetchall()
+
+    async def close(self):
+        """Close the cursor."""
+        self._cursor.close()
+
+
+class _SQLiteConnection:
+    """A sqlite3 connection with the awaitable interface of aiomysql's."""
+    def __init__(self, connection: sqlite3.Connection):
+        self._connection = connection
+
+    async def cursor(self) -> _SQLiteCursor:
+        """Return a new cursor on the connection."""
+        return _SQLiteCursor(self._connection.cursor())
+
+    async def commit(self):
+        """Commit the ongoing transaction."""
+        self._connection.commit()
+
+    async def rollback(self):
+        """Roll back the ongoing transaction."""
+        self._connection.rollback()
+
+    def close(self):
+        """Close the connection."""
+        self._connection.close()
+
+
+class SQLiteBackend(StorageBackend):
+    """An in-process SQLite database, for development, tests and benchmarks.
+
+    A single connection is shared so that a ":memory:" database lives as
+    long as the bot. Cursors take turns on that connection, so each
+    Storage call still runs in its own transaction.
+    """
+    Error = sqlite3.Error
+    IntegrityError = sqlite3.IntegrityError
+    DataError = sqlite3.DataError
+
+    def __init__(self, database: str = None):
+        super().__init__()
+        self.database = database or Config.SQLITE_DATABASE
+        self._connection: Optional[_SQLiteConnection] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._lock_loop = None
+
+    async def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    async def get_table_names(self) -> Set[str]:
+        async with self.cursor() as cursor:
+            await cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+            rows = await cursor.fetchall()
+
+        return {row[0] for row in rows}
+
+    def _get_lock(self) -> asyncio.Lock:
+        # Locks belong to the loop they were first used on, and unit tests
+        # run each test on a new loop.
+        if self._lock is None or self._lock_loop is not asyncio.get_running_loop():
+            self._lock = asyncio.Lock()
+            self._lock_loop = asyncio.get_running_loop()
+
+        return self._lock
+
+    def _connect(self):
+        return self._shared_connection()
+
+    @asynccontextmanager
+    async def _shared_connection(self):
+        async with self._get_lock():
+            if self._connection is None:
+                _log.info("Opening SQLite database: %s", self.database)
+                self._connection = _SQLiteConnection(sqlite3.connect(
+                    self.database, detect_types=sqlite3.PARSE_DECLTYPES))
+
+            yield self._connection
+
+    async def _open_cursor(
+        self,
+        connection: _SQLiteConnection,
+        unbuffered: bool = False,
+    ) -> _SQLiteCursor:
+        # sqlite3 cursors step through the result set lazily already.
+        return await connection.cursor()
+
+
+BACKENDS = {
+    "mysql":  MySQLBackend,
+    "sqlite": SQLiteBackend,
+}
+
+
+def create_backend(name: str) -> StorageBackend:
+    """Return a new instance of the named storage backend."""
+    try:
+        backend_type = BACKENDS[name.casefold()]
+    except KeyError as exc:
+        raise RuntimeError(f"Unknown STORAGE_BACKEND '{name}', expected one "
+                           f"of: {', '.join(BACKENDS)}") from exc
+
+    return backend_type()
@@ -5,7 +5,7 @@ from collections import Counter
 from datetime import datetime
 from functools import partial
 from pathlib import Path
-from typing import Any, List
+from typing import Any, Dict, List, Tuple
 
 import discord
 from discord.ext.commands import Command, Context
@@ -29,6 +29,26 @@ def str2bool(value: str) -> bool:
     return value.casefold() in {"yes", "y", "1", "true", "t"}
 
 
+def pity_chances(
+    levels: Dict[int, Tuple[float, float]],
+    increment: float,
+) -> Dict[int, Tuple[float, ...]]:
+    """Tabulate the chance of a heavy attack per level, indexed by the number
+    of unsuccessful actions in a row before it.
+
+    Chances rise by `increment` from the level's minimum, in whole
+    percentages, and the last chance in each table is the level's maximum,
+    which holds for any longer run of misses.
+    """
+    return {
+        level: tuple(
+            [percentage / 100 for percentage in range(*(int(x * 100) for x in (
+                min_chance, max_chance, increment)))]
+            + [max_chance])
+        for level, (min_chance, max_chance) in levels.items()
+    }
+
+
 def daterange_from_timestamp(timestamp: datetime):
     """Get the DateRange of the day containing the given timestamp."""
     get_timestamp_at_time = lambda time: datetime.strptime(
@@ -1,6 +1,7 @@
-from dataclasses import dataclass
-from datetime import datetime, timezone
+from dataclasses import dataclass, replace
+from datetime import date, datetime, timezone
 from enum import Enum
+from typing import Dict, Optional
 
 
 @dataclass
@@ -112,6 +113,7 @@ class Event:
     pom_goal: int
     start_date: datetime
     end_date: datetime
+    goal_reached: bool = False
 
 
 class ActionType(str, Enum):
@@ -124,8 +126,11 @@ class ActionType(str, Enum):
 
 
 @dataclass(frozen=True)
-class User:
-    """A user, as described, in order, from the database."""
+class User:  # pylint: disable=too-many-instance-attributes
+    """A user, as described, in order, from the database.
+
+    Its fields mirror the columns of the users table.
+    """
     # Tech debt: This should be moved to pombot.lib.pom_wars.types.
     user_id: int
     timezone: timezone
@@ -135,6 +140,22 @@ class User:
     attack_level: int
     heavy_attack_level: int
     defend_level: int
+    miss_streak: int = 0
+    miss_streak_date: Optional[date] = None
+
+    def misses_on(self, day: date) -> int:
+        """Return the number of unsuccessful actions in a row which end the
+        user's actions of the given day.
+        """
+        return self.miss_streak if self.miss_streak_date == day else 0
+
+    def after_action(self, day: date, was_successful: bool) -> "User":
+        """Return the user as updated by USER_MISS_STREAK_QUERY."""
+        return replace(
+            self,
+            miss_streak=0 if was_successful else self.misses_on(day) + 1,
+            miss_streak_date=day,
+        )
 
 
 @dataclass
@@ -188,3 +209,41 @@ class SessionType(str, Enum):
     BANKED = "Banked Poms"
     CURRENT = "Current Session"
     COMBINED = "Combined"
+
+
+@dataclass(frozen=True)
+class TeamStats:
+    """A team's running totals, as described, in order, from the database."""
+    # Tech debt: This should be moved to pombot.lib.pom_wars.types.
+    team: str
+    raw_damage: int
+    normal_attack_count: int
+    heavy_attack_count: int
+    defend_count: int
+    bribe_count: int
+    population: int
+
+    @property
+    def damage(self) -> int:
+        """The team's total damage."""
+        return int(self.raw_damage / 100.0)
+
+    @property
+    def action_counts(self) -> Dict[ActionType, int]:
+        """The number of actions of each type done by the team."""
+        return {
+            ActionType.NORMAL_ATTACK: self.normal_attack_count,
+            ActionType.HEAVY_ATTACK:  self.heavy_attack_count,
+            ActionType.DEFEND:        self.defend_count,
+            ActionType.BRIBE:         self.bribe_count,
+        }
+
+    @property
+    def attack_count(self) -> int:
+        """The team's total number of actions."""
+        return sum(self.action_counts.values())
+
+    @property
+    def favorite_action(self) -> ActionType:
+        """The team's most-used action."""
+        return max(self.action_counts, key=self.action_counts.get)
@@ -0,0 +1,53 @@
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from pombot.lib.types import User as PombotUser
+
+
+class UserCache:
+    """The most recently used rows of the users table, by userID.
+
+    Storage drops or replaces a user's row here whenever it writes to it.
+    """
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._users: "OrderedDict[int, PombotUser]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def get(self, user_id: int) -> Optional[PombotUser]:
+        """Return the cached user, or None when it is not cached."""
+        user = self._users.get(int(user_id))
+
+        if user is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._users.move_to_end(user.user_id)
+
+        return user
+
+    def peek(self, user_id: int) -> Optional[PombotUser]:
+        """Return the cached user, or None, without counting a lookup."""
+        return self._users.get(int(user_id))
+
+    def put(self, users: Iterable[PombotUser]):
+        """Cache users, evicting the least recently used beyond max_size."""
+        for user in users:
+            self._users[user.user_id] = user
+            self._users.move_to_end(user.user_id)
+
+        while len(self._users) > self.max_size:
+            self._users.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        """Forget a user so that it is read from the database next time."""
+        self._users.pop(int(user_id), None)
+
+    def clear(self):
+        """Forget every user."""
+        self._users.clear()
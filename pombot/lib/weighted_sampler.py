@@ -0,0 +1,97 @@
+"""Constant-time weighted random choice.
+
+`random.choices` accumulates the weights on every call and bisects them,
+which costs O(n) per choice when the weights are passed in. A
+WeightedSampler builds Walker's alias tables once, so that each choice
+afterwards takes a single random number and O(1) time, however many items
+there are.
+"""
+import random
+from typing import Generic, List, Sequence, TypeVar
+
+T = TypeVar("T")
+
+
+class WeightedSampler(Generic[T]):
+    """Choose items at random, in proportion to their weights.
+
+    >>> sampler = WeightedSampler(["common", "rare"], [9, 1])
+    >>> sampler.sample()  # "common" nine times out of ten.
+
+    @param items Items to choose from.
+    @param weights Relative, non-negative weight of each item.
+    @param rng Source of randomness, e.g. a seeded `random.Random`.
+        Defaults to the `random` module itself.
+    """
+    def __init__(self, items: Sequence[T], weights: Sequence[float], rng=random):
+        if len(items) != len(weights):
+            raise ValueError("The number of weights does not match the number of items")
+
+        if not items:
+            raise ValueError("Cannot sample from no items")
+
+        if any(weight < 0 for weight in weights) or not sum(weights) > 0:
+            raise ValueError("Weights must be non-negative and must not all be zero")
+
+        self.items = tuple(items)
+        self.rng = rng
+        self._probabilities, self._aliases = self._build_tables(weights)
+
+    @staticmethod
+    def _build_tables(weights: Sequence[float]):
+        num_items = len(weights)
+        total = sum(weights)
+
+        # Scale the weights so that they average to 1, then pair each
+        # underfull column with an overfull one which tops it up.
+        scaled = [weight * num_items / total for weight in weights]
+        probabilities = [1.0] * num_items
+        aliases = list(range(num_items))
+
+        small = [index for index, weight in enumerate(scaled) if weight < 1]
+        large = [index for index, weight in enumerate(scaled) if weight >= 1]
+
+        while small and large:
+            lesser, greater = small.pop(), large.pop()
+
+            probabilities[lesser] = scaled[lesser]
+            aliases[lesser] = greater
+
+            scaled[greater] -= 1 - scaled[lesser]
+            (small if scaled[greater] < 1 else large).append(greater)
+
+        # Whatever remains is only off from 1 by floating point error, and
+        # keeps its default probability of 1.
+        return probabilities, aliases
+
+    def sample(self, rng=None) -> T:
+        """Return one randomly chosen item.
+
+        @param rng Source of randomness for this call only.
+        """
+        position = (rng or self.rng).random() * len(self.items)
+        column = int(position)
+
+        if position - column < self._probabilities[column]:
+            return self.items[column]
+
+        return self.items[self._aliases[column]]
+
+    def sample_many(self, count: int, rng=None) -> List[T]:
+        """Return `count` items, chosen independently (with replacement).
+
+        @param rng Source of randomness for this call only.
+        """
+        rng = rng or self.rng
+        num_items = len(self.items)
+        items, probabilities, aliases = self.items, self._probabilities, self._aliases
+        samples = []
+
+        for _ in range(count):
+            position = rng.random() * num_items
+            column = int(position)
+
+            samples.append(items[column] if position - column < probabilities[column]
+                           else items[aliases[column]])
+
+        return samples
@@ -0,0 +1,158 @@
+"""Batching of INSERTs from many commands into few transactions.
+
+Each pom or action insert otherwise costs a transaction of its own. When
+enabled, inserts are held briefly and written together with `executemany`,
+so the commit is shared by every command which ran in the meantime.
+"""
+import asyncio
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from pombot.lib.storage_backends import StorageBackend
+
+_log = logging.getLogger(__name__)
+
+
+# Besides its settings, the buffer holds both the queued rows and the ones
+# being flushed, so that reads can wait for either.
+class WriteBuffer:  # pylint: disable=too-many-instance-attributes
+    """Queue of rows to insert, written after a delay or once enough rows
+    are waiting, whichever comes first.
+
+    Rows are remembered along with the user they belong to so that reads for
+    that user can flush them first and never miss the user's own writes.
+
+    @param max_attempts Number of times rows are tried before they are
+        dropped. Retries wait twice as long as the one before.
+    @param on_drop Called with the IDs of the users whose rows were dropped.
+    """
+    def __init__(
+        self,
+        backend: StorageBackend,
+        flush_interval_seconds: float,
+        max_rows: int,
+        max_attempts: int = 1,
+        on_drop: Callable[[Set[int]], None] = None,
+    ):
+        self.backend = backend
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_rows = max_rows
+        self.max_attempts = max_attempts
+        self.on_drop = on_drop
+        self._num_failed_attempts = 0
+
+        self._rows_by_query: Dict[str, List[Tuple]] = {}
+        self._num_rows = 0
+        self._pending_user_ids: Set[int] = set()
+        self._flushing_user_ids: Set[int] = set()
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._delayed_flush: Optional[asyncio.Task] = None
+
+    def _get_lock(self) -> asyncio.Lock:
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+
+        return self._flush_lock
+
+    def has_pending_for(self, user_id: int) -> bool:
+        """Return whether rows of the user have not yet been written."""
+        return user_id in self._pending_user_ids or user_id in self._flushing_user_ids
+
+    async def add(self, user_id: int, query: str, rows: Iterable[Tuple]):
+        """Queue rows to be inserted with the given query."""
+        rows = list(rows)
+
+        self._rows_by_query.setdefault(query, []).extend(rows)
+        self._num_rows += len(rows)
+        self._pending_user_ids.add(user_id)
+
+        if self._num_rows >= self.max_rows:
+            await self.flush()
+        elif self._delayed_flush is None:
+            self._delayed_flush = asyncio.create_task(
+                self._flush_after_delay(self.flush_interval_seconds))
+
+    async def _flush_after_delay(self, delay_seconds: float):
+        await asyncio.sleep(delay_seconds)
+
+        # From here on, the flush must not be cancelled halfway by another.
+        self._delayed_flush = None
+
+        try:
+            await self.flush()
+        except Exception:  # pylint: disable=broad-except
+            # Nobody is waiting on a timed flush to report the error to.
+            _log.exception("Failed to write buffered rows")
+
+    async def flush(self):
+        """Write every queued row in a single transaction.
+
+        Rows which fail to be written, for any reason, are queued again and
+        retried after a delay, up to max_attempts times in all. They are then
+        dropped so that one bad row cannot block every later write forever.
+        When the flush is cancelled, the rows are queued again as they were,
+        without counting an attempt. Within a transaction, nothing is
+        written: the rows would otherwise be rolled back along with it.
+        """
+        if self.backend.in_transaction:
+            return
+
+        if self._delayed_flush is not None:
+            self._delayed_flush.cancel()
+            self._delayed_flush = None
+
+        async with self._get_lock():
+            if not self._num_rows:
+                return
+
+            rows_by_query, self._rows_by_query = self._rows_by_query, {}
+            num_rows, self._num_rows = self._num_rows, 0
+            self._flushing_user_ids, self._pending_user_ids = self._pending_user_ids, set()
+            user_ids = self._flushing_user_ids
+
+            try:
+                async with self.backend.cursor() as cursor:
+                    for query, rows in rows_by_query.items():
+                        await cursor.executemany(query, rows)
+            except Exception:
+                self._num_failed_attempts += 1
+
+                if self._num_failed_attempts < self.max_attempts:
+                    _log.error("Failed to write %d buffered rows, attempt %d of %d",
+                               num_rows, self._num_failed_attempts, self.max_attempts)
+                    self._requeue(rows_by_query, num_rows, user_ids)
+                else:
+                    _log.error("Dropped %d buffered rows", num_rows)
+                    self._num_failed_attempts = 0
+
+                    if self.on_drop is not None:
+                        self.on_drop(user_ids)
+                raise
+            except BaseException:
+                self._restore(rows_by_query, num_rows, user_ids)
+                raise
+            else:
+                self._num_failed_attempts = 0
+            finally:
+                self._flushing_user_ids = set()
+
+    def _requeue(self, rows_by_query: Dict[str, List[Tuple]], num_rows: int,
+                 user_ids: Set[int]):
+        """Queue rows which failed to be written ahead of any added since,
+        and retry them after a delay.
+        """
+        self._restore(rows_by_query, num_rows, user_ids)
+
+        if self._delayed_flush is None:
+            delay_seconds = self.flush_interval_seconds * 2 ** self._num_failed_attempts
+            self._delayed_flush = asyncio.create_task(self._flush_after_delay(delay_seconds))
+
+    def _restore(self, rows_by_query: Dict[str, List[Tuple]], num_rows: int,
+                 user_ids: Set[int]):
+        """Queue rows which were not written ahead of any added since."""
+        for query, rows in self._rows_by_query.items():
+            rows_by_query.setdefault(query, []).extend(rows)
+
+        self._rows_by_query = rows_by_query
+        self._num_rows += num_rows
+        self._pending_user_ids |= user_ids
@@ -1,13 +1,52 @@
+import asyncio
+
+from pombot.lib.event_progress import EventProgress
+from pombot.lib.pom_wars.daily_actions import DailyActionCounter
+from pombot.lib.pom_wars.defence_ledger import DefenceLedger
+
+
 class State:
-    """In-memory bot state."""
+    """In-memory bot state.
+
+    The counts and caches here belong to this bot process. Each is seeded
+    from storage and then kept up to date by this process's own writes, so
+    that reading it needs no query. Writes by another bot process sharing
+    the database are not seen until the next seed; counts which must follow
+    every process, like the event pom count, are seeded again periodically.
+    """
     # Discord creates an event loop for us. Instead of creating a new one, we
     # can hook into the existing event loop to call our storage later.
     event_loop = None
 
+    # Pool of database connections, created once the event loop is known.
+    # When this is None, storage falls back to a connection per query.
+    db_pool = None
+
+    # Set once the tables exist and are migrated. Every on_ready listener
+    # runs as its own task, so others must wait for it before using storage.
+    storage_ready = asyncio.Event()
+
     # Scoreboard object to preserve and dynamically update scoreboard channels
     # during Pomwar events.
     # NOTE: The type is not imported to avoid a circular import.
     scoreboard = None
 
-    # Tech debt: This should be a column in the events table of the DB.
-    goal_reached: bool = False
+    # Every Pom War action, loaded once when the Pom Wars extension is.
+    # NOTE: The type is not imported to avoid a circular import.
+    action_catalog = None
+
+    # Watches the actions directories to reload action_catalog as they change.
+    # NOTE: The type is not imported to avoid a circular import.
+    catalog_watcher = None
+
+    # Number of poms added during the ongoing event, kept up to date by
+    # Storage as poms are added and removed.
+    event_progress = EventProgress()
+
+    # Successful defends still protecting each team, rebuilt by Storage on
+    # startup and added to as defends succeed.
+    defence_ledger = DefenceLedger()
+
+    # Each user's number of actions today and trailing misses, seeded by
+    # Storage on first use and kept up to date as actions are added.
+    daily_actions = DailyActionCounter()
@@ -0,0 +1,21 @@
+"""sqlite_rows.py - A test case backed by a throwaway, in-memory SQLite
+database holding a single `rows` table.
+"""
+from unittest import IsolatedAsyncioTestCase
+
+from pombot.lib.storage_backends import SQLiteBackend
+
+
+class SQLiteRowsTestCase(IsolatedAsyncioTestCase):
+    """Create the `rows` table, with `columns`, before each test."""
+    backend = None
+    columns = "value INT NOT NULL"
+
+    async def asyncSetUp(self):
+        self.backend = SQLiteBackend(":memory:")
+
+        async with self.backend.cursor() as cursor:
+            await cursor.execute(f"CREATE TABLE rows ({self.columns});")
+
+    async def asyncTearDown(self):
+        await self.backend.close()
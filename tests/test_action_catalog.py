@@ -0,0 +1,54 @@
+import random
+import unittest
+from unittest.mock import patch
+
+from pombot.data.pom_wars import ActionCatalog, ActionCategory, read_action_categories
+
+
+class TestActionCatalog(unittest.TestCase):
+    """Test loading the Pom War actions and choosing among them."""
+    def test_catalog_holds_every_action(self):
+        """Test that each category holds the actions of its directory, with
+        their kind, and that attacks are looked up by kind.
+        """
+        catalog = ActionCatalog.load(use_bundle=False)
+
+        for name, actions in read_action_categories().items():
+            category = getattr(catalog, name)
+            self.assertEqual([action["name"] for action in actions],
+                             [action.name for action in category.actions])
+
+        for is_heavy in (False, True):
+            for is_critical in (False, True):
+                category = catalog.attacks(is_heavy=is_heavy, is_critical=is_critical)
+                self.assertTrue(category.actions)
+                self.assertTrue(all(action.is_heavy == is_heavy
+                                    and action.is_critical == is_critical
+                                    for action in category.actions))
+
+    def test_unusable_bundle_falls_back_to_directories(self):
+        """Test that the directories are read when there is no bundle."""
+        with patch("pombot.data.pom_wars.load_actions_bundle", return_value=None):
+            catalog = ActionCatalog.load()
+
+        self.assertEqual(
+            [action.name for action in ActionCatalog.load(use_bundle=False).bribes.actions],
+            [action.name for action in catalog.bribes.actions])
+
+    def test_choice_follows_weights(self):
+        """Test that only weighted actions are chosen, and that a seeded
+        source of randomness gives the same choices.
+        """
+        category = ActionCategory(tuple("abc"), (0, 1, 0))
+        self.assertEqual({"b"}, {category.choose() for _ in range(100)})
+
+        catalog = ActionCatalog.load(use_bundle=False)
+        choices = [[catalog.defends.choose(random.Random(seed)).name for seed in range(20)]
+                   for _ in range(2)]
+
+        self.assertEqual(*choices)
+        self.assertTrue(set(choices[0]) <= {action.name for action in catalog.defends.actions})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,8 +2,11 @@ import unittest
 from datetime import datetime, timedelta, timezone
 from unittest.mock import MagicMock, Mock, patch
 
+from parameterized import parameterized
+
 from pombot.config import Debug
 from pombot.lib.pom_wars.action_chances import is_action_successful
+from pombot.lib.pom_wars.daily_actions import DailyActions
 from pombot.lib.types import User as PombotUser
 
 # For vertical alignment.
@@ -18,12 +21,12 @@ class TestActionSuccessRates(unittest.IsolatedAsyncioTestCase):
         Debug.BENCHMARK_POMWAR_ATTACK = False
         return super().setUp()
 
-    @patch("pombot.lib.storage.Storage.get_actions")
+    @patch("pombot.lib.storage.Storage.get_daily_actions")
     @patch("random.random")
     async def test_normal_attack_success_rate(
         self,
         random_mock: Mock,
-        get_actions_mock: Mock,
+        get_daily_actions_mock: Mock,
     ):
         """Generically test _is_attack_successful when doing a normal attack."""
         dice_rolls_and_expected_outcomes = {
@@ -59,7 +62,8 @@ class TestActionSuccessRates(unittest.IsolatedAsyncioTestCase):
 
         for pom_number, settings in dice_rolls_and_expected_outcomes.items():
             actions.append(pom_number)
-            get_actions_mock.return_value = actions
+            get_daily_actions_mock.return_value = DailyActions(
+                count=len(actions), num_misses=0)
             print(f"len(actions) = {len(actions)}")
 
             for dice_roll, expected_outcome in zip(*settings):
@@ -70,14 +74,14 @@ class TestActionSuccessRates(unittest.IsolatedAsyncioTestCase):
                 self.assertEqual(expected_outcome, actual_outcome,
                     f"pom_number: {pom_number}, dice_roll: {dice_roll}")
 
-    @patch("pombot.lib.storage.Storage.get_actions")
+    @patch("pombot.lib.storage.Storage.get_daily_actions")
     @patch("pombot.lib.storage.Storage.get_user_by_id")
     @patch("random.random")
     async def test_heavy_attack_success_rate(
         self,
         random_mock: Mock,
         get_user_by_id_mock: Mock,
-        get_actions_mock: Mock,
+        get_daily_actions_mock: Mock,
     ):
         """Generically test _is_attack_successful when doing a heavy attack."""
         class MockPom(MagicMock):
@@ -127,7 +131,8 @@ class TestActionSuccessRates(unittest.IsolatedAsyncioTestCase):
 
         for pom_number, settings in dice_rolls_and_expected_outcomes.items():
             actions.append(pom_number)
-            get_actions_mock.return_value = actions
+            get_daily_actions_mock.return_value = DailyActions(
+                count=len(actions), num_misses=0)
             print(f"len(actions) = {len(actions)}")
 
             for dice_roll, expected_outcome in zip(*settings):
@@ -139,12 +144,45 @@ class TestActionSuccessRates(unittest.IsolatedAsyncioTestCase):
                     expected_outcome, actual_outcome,
                     f"pom_number: {pom_number}, dice_roll: {dice_roll}")
 
-    @patch("pombot.lib.storage.Storage.get_actions")
+    @parameterized.expand([
+        (0, 0.33),
+        (1, 0.43),
+        (4, 0.73),
+        (5, 0.83),
+        (9, 0.83),
+    ])
+    @patch("pombot.lib.storage.Storage.get_daily_actions")
+    @patch("pombot.lib.storage.Storage.get_user_by_id")
+    @patch("random.random")
+    async def test_heavy_attack_pity(
+        self,
+        num_misses: int,
+        expected_chance: float,
+        random_mock: Mock,
+        get_user_by_id_mock: Mock,
+        get_daily_actions_mock: Mock,
+    ):
+        """Test that each miss in a row raises the chance of a heavy attack,
+        up to the maximum of the user's level.
+        """
+        get_user_by_id_mock.return_value = PombotUser(
+            1234, timezone(timedelta()), "Team", "inventory", 1, 1, 4, 1)
+        get_daily_actions_mock.return_value = DailyActions(
+            count=1, num_misses=num_misses)
+
+        for dice_roll, expected_outcome in ((expected_chance, TRU),
+                                            (expected_chance + 0.001, FLS)):
+            random_mock.return_value = dice_roll
+            actual_outcome = await is_action_successful(MagicMock(), datetime.now(), True)
+
+            self.assertEqual(expected_outcome, actual_outcome, f"dice_roll: {dice_roll}")
+
+    @patch("pombot.lib.storage.Storage.get_daily_actions")
     @patch("random.random")
     async def test_defend_success_rate(
         self,
         random_mock: Mock,
-        get_actions_mock: Mock,
+        get_daily_actions_mock: Mock,
     ):
         """Generically test _is_attack_successful when doing a defend."""
         dice_rolls_and_expected_outcomes = {
@@ -180,7 +218,8 @@ class TestActionSuccessRates(unittest.IsolatedAsyncioTestCase):
 
         for pom_number, settings in dice_rolls_and_expected_outcomes.items():
             actions.append(pom_number)
-            get_actions_mock.return_value = actions
+            get_daily_actions_mock.return_value = DailyActions(
+                count=len(actions), num_misses=0)
             print(f"len(actions) = {len(actions)}")
 
             for dice_roll, expected_outcome in zip(*settings):
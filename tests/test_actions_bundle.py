@@ -0,0 +1,84 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from pombot.config import Pomwars
+from pombot.data import Locations, load_actions_bundle, write_actions_bundle
+
+CATEGORIES = {"bribes": [{"name": "bribe", "message": "Hello", "meta": "{}"}]}
+
+
+class TestActionsBundle(unittest.TestCase):
+    """Test loading the actions from the bundle, and falling back to the
+    actions directories when it can't be trusted.
+    """
+    bundle_path = None
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(temp_dir.cleanup)
+        self.bundle_path = Path(temp_dir.name) / "pom_wars.bundle.json"
+
+        bundle_patch = patch.object(Locations, "ACTIONS_BUNDLE", self.bundle_path)
+        bundle_patch.start()
+        self.addCleanup(bundle_patch.stop)
+
+        load_actions_bundle.cache_clear()
+        self.addCleanup(load_actions_bundle.cache_clear)
+
+    def _edit_bundle(self, **changes):
+        bundle = json.loads(self.bundle_path.read_text(encoding="utf8"))
+        self.bundle_path.write_text(json.dumps({**bundle, **changes}), encoding="utf8")
+        load_actions_bundle.cache_clear()
+
+    def test_bundle_is_loaded(self):
+        """Test that the written categories are read back as they were."""
+        write_actions_bundle(CATEGORIES)
+
+        self.assertEqual(CATEGORIES, load_actions_bundle())
+
+    def test_missing_or_unreadable_bundle_is_ignored(self):
+        """Test that there is no bundle to use without a valid file."""
+        self.assertIsNone(load_actions_bundle())
+
+        self.bundle_path.write_text("{", encoding="utf8")
+        load_actions_bundle.cache_clear()
+
+        self.assertIsNone(load_actions_bundle())
+
+    def test_bundle_of_another_version_is_ignored(self):
+        """Test that a bundle written by another version is not used."""
+        write_actions_bundle(CATEGORIES)
+        self._edit_bundle(version=0)
+
+        self.assertIsNone(load_actions_bundle())
+
+    def test_bundle_with_bad_checksum_is_ignored(self):
+        """Test that a bundle edited since it was written is not used."""
+        write_actions_bundle(CATEGORIES)
+        self._edit_bundle(categories={"bribes": []})
+
+        self.assertIsNone(load_actions_bundle())
+
+    def test_bundle_age_is_only_checked_on_request(self):
+        """Test that the actions directories are only read to check the age
+        of the bundle when CHECK_ACTIONS_BUNDLE_AGE is set.
+        """
+        write_actions_bundle(CATEGORIES)
+        bundle_mtime = self.bundle_path.stat().st_mtime
+
+        with patch("pombot.data.newest_actions_mtime",
+                   return_value=bundle_mtime + 1) as newest_actions_mtime:
+            self.assertEqual(CATEGORIES, load_actions_bundle())
+            newest_actions_mtime.assert_not_called()
+
+            load_actions_bundle.cache_clear()
+
+            with patch.object(Pomwars, "CHECK_ACTIONS_BUNDLE_AGE", True):
+                self.assertIsNone(load_actions_bundle())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import time
+import unittest
+from unittest.mock import patch
+
+from pombot.lib.pom_wars.catalog_watcher import CatalogWatcher
+from pombot.state import State
+
+WATCHER = "pombot.lib.pom_wars.catalog_watcher"
+
+
+class TestCatalogWatcher(unittest.IsolatedAsyncioTestCase):
+    """Test reloading the actions as they change."""
+    def setUp(self):
+        self.original_catalog = State.action_catalog
+        State.action_catalog = "old catalog"
+
+    def tearDown(self):
+        State.action_catalog = self.original_catalog
+
+    async def test_unchanged_actions_are_not_reloaded(self):
+        """Test that nothing is read while no action changes."""
+        with patch(f"{WATCHER}.newest_actions_mtime", return_value=1.0), \
+                patch.object(CatalogWatcher, "_load") as load:
+            watcher = CatalogWatcher()
+
+            self.assertFalse(await watcher.reload_if_changed())
+            self.assertFalse(await watcher.reload_if_changed())
+            load.assert_not_called()
+
+        self.assertEqual("old catalog", State.action_catalog)
+
+    async def test_changed_actions_are_swapped_in(self):
+        """Test that a valid change replaces the catalog."""
+        with patch(f"{WATCHER}.newest_actions_mtime", side_effect=[1.0, 2.0]), \
+                patch.object(CatalogWatcher, "_load", return_value="new catalog"):
+            watcher = CatalogWatcher()
+
+            self.assertFalse(await watcher.reload_if_changed())
+            self.assertTrue(await watcher.reload_if_changed())
+
+        self.assertEqual("new catalog", State.action_catalog)
+
+    async def test_invalid_change_keeps_current_catalog(self):
+        """Test that a change failing the checks is not swapped in, nor
+        retried until the next change.
+        """
+        error = RuntimeError("Missing meta.json")
+
+        with patch(f"{WATCHER}.newest_actions_mtime", side_effect=[1.0, 2.0, 2.0]), \
+                patch.object(CatalogWatcher, "_load", side_effect=error) as load:
+            watcher = CatalogWatcher()
+
+            self.assertFalse(await watcher.reload_if_changed())
+            self.assertFalse(await watcher.reload_if_changed())
+            self.assertFalse(await watcher.reload_if_changed())
+            load.assert_called_once()
+
+        self.assertEqual("old catalog", State.action_catalog)
+
+    async def test_change_after_load_is_reloaded_by_first_poll(self):
+        """Test that actions changed between loading the catalog and the
+        first poll are reloaded, and that older ones are not.
+        """
+        for mtime_since_load, is_reloaded in ((-60, False), (60, True)):
+            with patch(f"{WATCHER}.ActionCatalog.load", return_value="old catalog"):
+                watcher = CatalogWatcher()
+                State.action_catalog = watcher.load_catalog()
+
+            mtime = time.time() + mtime_since_load
+
+            with patch(f"{WATCHER}.newest_actions_mtime", return_value=mtime), \
+                    patch.object(CatalogWatcher, "_load", return_value="new catalog"):
+                self.assertEqual(is_reloaded, await watcher.reload_if_changed())
+                self.assertFalse(await watcher.reload_if_changed())
+
+        self.assertEqual("new catalog", State.action_catalog)
+
+
+if __name__ == "__main__":
+    unittest.main()
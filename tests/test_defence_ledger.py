@@ -0,0 +1,53 @@
+import unittest
+from datetime import datetime, timedelta
+
+from pombot.config import Pomwars
+from pombot.lib.pom_wars.defence_ledger import DefenceLedger
+
+NOW = datetime(2021, 6, 1, 12)
+DURATION = timedelta(minutes=Pomwars.DEFEND_DURATION_MINUTES)
+
+
+class TestDefenceLedger(unittest.TestCase):
+    """Test the defence of teams by their recent defends."""
+    def test_active_defends_add_up(self):
+        """Test that each defender adds their multiplier once."""
+        ledger = DefenceLedger()
+        ledger.add("Knight", 1, NOW - timedelta(minutes=2), 0.05)
+        ledger.add("Knight", 1, NOW - timedelta(minutes=1), 0.05)
+        ledger.add("Knight", 2, NOW - timedelta(minutes=1), 0.08)
+        ledger.add("Viking", 3, NOW, 0.09)
+
+        self.assertAlmostEqual(1 - 0.13, ledger.get_multiplier("Knight", NOW))
+
+    def test_expired_and_future_defends_do_not_count(self):
+        """Test that only defends made within the duration before the
+        attack count.
+        """
+        ledger = DefenceLedger()
+        ledger.add("Knight", 1, NOW - DURATION - timedelta(seconds=1), 0.05)
+        ledger.add("Knight", 2, NOW + timedelta(seconds=1), 0.08)
+
+        self.assertEqual(1, ledger.get_multiplier("Knight", NOW))
+
+    def test_expired_defend_added_late_does_not_count(self):
+        """Test that a defend added after a later one still expires."""
+        ledger = DefenceLedger()
+        ledger.add("Knight", 1, NOW - timedelta(minutes=1), 0.05)
+        ledger.add("Knight", 2, NOW - DURATION - timedelta(seconds=1), 0.08)
+
+        self.assertAlmostEqual(1 - 0.05, ledger.get_multiplier("Knight", NOW))
+
+    def test_defence_is_capped(self):
+        """Test that a team cannot be defended beyond the maximum."""
+        ledger = DefenceLedger()
+
+        for user_id in range(10):
+            ledger.add("Knight", user_id, NOW, 0.09)
+
+        self.assertAlmostEqual(1 - Pomwars.MAXIMUM_TEAM_DEFENCE,
+                               ledger.get_multiplier("Knight", NOW))
+
+
+if __name__ == "__main__":
+    unittest.main()
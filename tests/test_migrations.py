@@ -0,0 +1,59 @@
+import unittest
+from unittest.async_case import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+from pombot.config import Config
+from pombot.lib.migrations import MIGRATIONS, Migration
+from pombot.lib.storage import Storage
+
+TEST_MIGRATIONS = [
+    Migration(1000, "Create a test table", (
+        "CREATE TABLE migration_test (value INT NOT NULL);",
+    )),
+    Migration(1001, "Fill the test table", (
+        "INSERT INTO migration_test (value) VALUES (1);",
+    )),
+]
+
+
+class TestMigrations(IsolatedAsyncioTestCase):
+    """Test applying the schema migrations."""
+    async def asyncSetUp(self) -> None:
+        """Ensure database tables exist."""
+        await Storage.create_tables_if_not_exists()
+
+    async def asyncTearDown(self) -> None:
+        """Forget the test migrations."""
+        async with Storage.backend.cursor() as cursor:
+            await cursor.execute("DROP TABLE IF EXISTS migration_test;")
+            await cursor.execute(
+                f"DELETE FROM {Config.MIGRATIONS_TABLE} WHERE version >= %s;", (1000, ))
+
+    async def _applied_versions(self) -> list:
+        async with Storage.backend.cursor() as cursor:
+            await cursor.execute(
+                f"SELECT version FROM {Config.MIGRATIONS_TABLE} ORDER BY version;")
+            return [version for version, in await cursor.fetchall()]
+
+    async def test_every_migration_is_recorded(self):
+        """Test that creating the tables applies every migration."""
+        self.assertEqual([migration.version for migration in MIGRATIONS],
+                         await self._applied_versions())
+
+    async def test_pending_migrations_are_applied_once(self):
+        """Test that pending migrations run in order and are recorded, and
+        that they are skipped once applied.
+        """
+        with patch("pombot.lib.storage.MIGRATIONS", [*MIGRATIONS, *TEST_MIGRATIONS]):
+            await Storage.apply_pending_migrations()
+            await Storage.apply_pending_migrations()
+
+        self.assertEqual([1000, 1001], (await self._applied_versions())[-2:])
+
+        async with Storage.backend.cursor() as cursor:
+            await cursor.execute("SELECT value FROM migration_test;")
+            self.assertEqual([(1, )], list(await cursor.fetchall()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+
+from pombot.lib import query_builder
+from pombot.lib.query_builder import Aggregate, Filters
+
+
+class TestQueryBuilder(unittest.TestCase):
+    """Test rendering SQL statements from filters."""
+    def test_select_without_filters(self):
+        """Test a SELECT which matches every row."""
+        query, args = query_builder.select("poms")
+
+        self.assertEqual("SELECT * FROM poms;", query)
+        self.assertEqual([], args)
+
+    def test_conditions_are_joined_with_and(self):
+        """Test that every condition after the first is an AND."""
+        filters = Filters().equal("userID", 1).between("time_set", "start", "end")
+        query, args = query_builder.delete("poms", filters)
+
+        self.assertEqual(
+            "DELETE FROM poms WHERE time_set<=%s AND time_set>=%s AND userID=%s;",
+            query)
+        self.assertEqual(["end", "start", 1], args)
+
+    def test_filter_order_does_not_change_statement(self):
+        """Test that the same filters added in a different order render the
+        same query with matching arguments.
+        """
+        first = Filters().equal("userID", 1).equal("descript", "reading")
+        second = Filters().equal("descript", "reading").equal("userID", 1)
+
+        self.assertEqual(query_builder.select("poms", first),
+                         query_builder.select("poms", second))
+
+    def test_one_of_pads_to_power_of_two(self):
+        """Test that lists of similar lengths share one statement."""
+        three_users, args = query_builder.select(
+            "users", Filters().one_of("userID", [1, 2, 3]))
+        four_users, _ = query_builder.select(
+            "users", Filters().one_of("userID", [1, 2, 3, 4]))
+
+        self.assertEqual(three_users, four_users)
+        self.assertEqual("SELECT * FROM users WHERE userID IN (%s, %s, %s, %s);",
+                         three_users)
+        self.assertEqual([1, 2, 3, 3], args)
+
+    def test_order_by_and_limit(self):
+        """Test that the limit is the final argument."""
+        query, args = query_builder.select(
+            "poms", Filters().equal("userID", 1), order_by="time_set DESC", limit=1)
+
+        self.assertEqual(
+            "SELECT * FROM poms WHERE userID=%s ORDER BY time_set DESC LIMIT %s;",
+            query)
+        self.assertEqual([1, 1], args)
+
+    def test_aggregate_columns(self):
+        """Test aggregate expressions and that only plain columns are
+        accepted.
+        """
+        query, _ = query_builder.select(
+            "actions", columns=query_builder.aggregate(Aggregate.SUM, "damage"))
+
+        self.assertEqual("SELECT SUM(damage) FROM actions;", query)
+
+        with self.assertRaises(ValueError):
+            query_builder.aggregate(Aggregate.COUNT, "1); DROP TABLE actions; --")
+
+
+if __name__ == "__main__":
+    unittest.main()
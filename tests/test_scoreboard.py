@@ -0,0 +1,108 @@
+import asyncio
+import unittest
+from unittest.async_case import IsolatedAsyncioTestCase
+from unittest.mock import AsyncMock, Mock, patch
+
+import discord.errors
+
+from pombot.config import Pomwars
+from pombot.lib.pom_wars.scoreboard import Scoreboard
+from pombot.lib.storage import Storage
+from tests.helpers import mock_discord
+
+
+def _mock_channel(edit_error: Exception = None) -> mock_discord.MockTextChannel:
+    """Return an empty join channel whose remembered message can be edited,
+    or fails to be with `edit_error`.
+    """
+    channel = mock_discord.MockTextChannel()
+    channel.get_partial_message = Mock(return_value=Mock(edit=AsyncMock(side_effect=edit_error)))
+    channel.history = Mock(return_value=Mock(flatten=AsyncMock(return_value=[])))
+    channel.send = AsyncMock(return_value=Mock(id=7, add_reaction=AsyncMock()))
+
+    return channel
+
+
+def _http_error(error_type: type, status: int) -> discord.errors.HTTPException:
+    return error_type(Mock(status=status, reason=""), "")
+
+
+class TestScoreboard(IsolatedAsyncioTestCase):
+    """Test refreshing the scoreboards of the join channels."""
+    async def asyncSetUp(self) -> None:
+        """Ensure database tables exist and are empty."""
+        await Storage.create_tables_if_not_exists()
+        await Storage.delete_all_rows_from_all_tables()
+
+    async def asyncTearDown(self) -> None:
+        """Cleanup the database."""
+        await Storage.delete_all_rows_from_all_tables()
+
+    async def _scoreboard_with_messages(self, *channels) -> Scoreboard:
+        for channel in channels:
+            await Storage.set_scoreboard_message_id(channel.id, 42)
+
+        scoreboard = Scoreboard(Mock(), list(channels))
+        await scoreboard.load_message_ids()
+
+        return scoreboard
+
+    async def test_refresh_requests_are_coalesced(self):
+        """Test that a burst of requests results in a single update."""
+        scoreboard = Scoreboard(Mock(), [])
+        scoreboard.update = AsyncMock()
+
+        with patch.object(Pomwars, "SCOREBOARD_REFRESH_SECONDS", 0):
+            for _ in range(3):
+                scoreboard.mark_dirty()
+
+            await asyncio.sleep(0.01)
+            self.assertEqual(1, scoreboard.update.await_count)
+
+            scoreboard.mark_dirty()
+            await asyncio.sleep(0.01)
+            self.assertEqual(2, scoreboard.update.await_count)
+
+        scoreboard.stop()
+
+    async def test_unchanged_scoreboard_is_not_sent_again(self):
+        """Test that the remembered message is edited without reading the
+        channel, and only when the scoreboard changed.
+        """
+        channel = _mock_channel()
+        scoreboard = await self._scoreboard_with_messages(channel)
+
+        await scoreboard.update()
+        await scoreboard.update()
+
+        channel.get_partial_message.assert_called_once_with(42)
+        channel.get_partial_message.return_value.edit.assert_awaited_once()
+        channel.history.assert_not_called()
+
+    async def test_deleted_message_is_replaced(self):
+        """Test that the channel is read again when the remembered message
+        was deleted, and that the new message is remembered.
+        """
+        channel = _mock_channel(_http_error(discord.errors.NotFound, 404))
+        scoreboard = await self._scoreboard_with_messages(channel)
+
+        self.assertEqual([[], []], await scoreboard.update())
+
+        channel.history.assert_called_once()
+        channel.send.assert_awaited_once()
+        self.assertEqual({channel.id: 7}, await Storage.get_scoreboard_message_ids())
+
+    async def test_failing_channel_does_not_stop_others(self):
+        """Test that an error in one channel is isolated from the others."""
+        failing = _mock_channel(RuntimeError("Discord is down"))
+        restricted = _mock_channel(_http_error(discord.errors.Forbidden, 403))
+        working = _mock_channel()
+        scoreboard = await self._scoreboard_with_messages(failing, restricted, working)
+
+        self.assertEqual([[], [restricted]], await scoreboard.update())
+
+        working.get_partial_message.return_value.edit.assert_awaited_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,310 @@
+import unittest
+from datetime import date, datetime, timedelta, timezone
+from unittest.async_case import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+import pombot.lib.pom_wars.errors as war_crimes
+from pombot.config import Config
+from pombot.lib.query_builder import Aggregate
+from pombot.lib.storage import Storage
+from pombot.lib.types import ActionType, DateRange, TeamStats
+from pombot.lib.write_buffer import WriteBuffer
+from pombot.state import State
+from tests.helpers import mock_discord
+
+
+class TestStorage(IsolatedAsyncioTestCase):
+    """Test Storage against the configured database."""
+    ctx = None
+
+    async def asyncSetUp(self) -> None:
+        """Ensure database tables exist and create contexts for the tests."""
+        self.ctx = mock_discord.MockContext()
+        await Storage.create_tables_if_not_exists()
+        await Storage.delete_all_rows_from_all_tables()
+        await Storage.add_user(self.ctx.author.id, timezone.utc, "Knight")
+
+    async def asyncTearDown(self) -> None:
+        """Cleanup the database."""
+        await Storage.delete_all_rows_from_all_tables()
+
+    async def _add_action(self, action_type: ActionType, was_successful: bool = True,
+                          damage: int = 0, time_set: datetime = None):
+        await Storage.add_pom_war_action(
+            self.ctx.author, "Knight", action_type, was_successful, False, "",
+            damage, time_set or datetime.now())
+
+    async def _add_pom_from_other_process(self, time_set: datetime):
+        """Add a pom without letting this process's state know about it."""
+        async with Storage.backend.cursor() as cursor:
+            await cursor.execute(
+                f"INSERT INTO {Config.POMS_TABLE} (userID, time_set, current_session) "
+                "VALUES (%s, %s, 1);", (self.ctx.author.id, time_set))
+
+    async def test_transaction_sees_buffered_writes(self):
+        """Test that rows buffered before a transaction are written before
+        it opens, so that reads within it see them.
+        """
+        original_buffer = Storage.write_buffer
+        Storage.write_buffer = WriteBuffer(Storage.backend, 60, 100)
+
+        try:
+            await self._add_action(ActionType.BRIBE)
+            State.daily_actions.clear()
+
+            async with Storage.transaction():
+                actions = await Storage.get_daily_actions(self.ctx.author, datetime.now())
+        finally:
+            Storage.write_buffer = original_buffer
+
+        self.assertEqual(1, actions.count)
+
+    async def test_duplicate_user_keeps_caches(self):
+        """Test that failing to add an existing user forgets nothing cached."""
+        await Storage.get_user_by_id(self.ctx.author.id)
+        await Storage.get_daily_actions(self.ctx.author, datetime.now())
+
+        with self.assertRaises(war_crimes.UserAlreadyExistsError):
+            await Storage.add_user(self.ctx.author.id, timezone.utc, "Viking")
+
+        self.assertIsNotNone(Storage.user_cache.peek(self.ctx.author.id))
+        self.assertIsNotNone(State.daily_actions.get(self.ctx.author.id, date.today()))
+
+    async def test_rollback_forgets_what_it_counted(self):
+        """Test that a rolled back action is uncounted, and that the tallies
+        of other users are kept.
+        """
+        other = mock_discord.MockContext().author
+        await Storage.add_user(other.id, timezone.utc, "Viking")
+        await Storage.get_daily_actions(other, datetime.now())
+
+        with self.assertRaises(RuntimeError):
+            async with Storage.transaction():
+                await Storage.get_daily_actions(self.ctx.author, datetime.now())
+                await self._add_action(ActionType.DEFEND)
+                raise RuntimeError("Command failed")
+
+        self.assertIsNone(State.daily_actions.get(self.ctx.author.id, date.today()))
+        self.assertIsNotNone(State.daily_actions.get(other.id, date.today()))
+        self.assertEqual(
+            0, (await Storage.get_daily_actions(self.ctx.author, datetime.now())).count)
+
+    async def test_team_stats_follow_actions_and_users(self):
+        """Test that actions and team changes update the running totals."""
+        await self._add_action(ActionType.NORMAL_ATTACK, damage=10)
+        await self._add_action(ActionType.HEAVY_ATTACK, was_successful=False)
+        await self._add_action(ActionType.DEFEND)
+        await Storage.update_user_team(self.ctx.author.id, "Viking")
+
+        self.assertEqual(TeamStats("Knight", 1000, 1, 1, 1, 0, 0),
+                         await Storage.get_team_stats("Knight"))
+        self.assertEqual(TeamStats("Viking", 0, 0, 0, 0, 0, 1),
+                         await Storage.get_team_stats("Viking"))
+
+    async def test_rebuilt_team_stats_match_running_totals(self):
+        """Test that the team summary and a rebuild agree with the totals
+        kept by the deltas.
+        """
+        await Storage.add_user(mock_discord.MockContext().author.id, timezone.utc, "Viking")
+        await self._add_action(ActionType.NORMAL_ATTACK, damage=10)
+        await self._add_action(ActionType.BRIBE)
+        running_totals = await Storage.get_all_team_stats()
+
+        self.assertEqual(running_totals, await Storage.get_team_summary())
+
+        await Storage.rebuild_team_stats()
+
+        self.assertEqual(running_totals, await Storage.get_all_team_stats())
+
+    async def test_event_progress_is_counted_incrementally(self):
+        """Test that the event pom count is seeded once, then follows added
+        and deleted poms.
+        """
+        now = datetime.now().replace(microsecond=0)
+        await Storage.add_new_event(
+            "Event", 10, DateRange(now - timedelta(days=1), now + timedelta(days=1)))
+        await Storage.add_poms_to_user_session(self.ctx.author, "", 2, now)
+
+        progress = await Storage.get_event_progress()
+        self.assertEqual(2, progress.num_poms)
+
+        await Storage.add_poms_to_user_session(self.ctx.author, "", 3, now)
+        await Storage.add_poms_to_user_session(
+            self.ctx.author, "", 1, now - timedelta(days=2))
+        self.assertEqual(5, progress.num_poms)
+
+        await Storage.delete_poms(user=self.ctx.author, time_set=now)
+        self.assertEqual(0, progress.num_poms)
+
+        # Poms deleted without a timestamp can't be attributed to the event.
+        await Storage.add_poms_to_user_session(self.ctx.author, "", 4, now)
+        await Storage.delete_poms(user=self.ctx.author)
+        self.assertFalse(progress.is_valid_at(now))
+        self.assertEqual(0, (await Storage.get_event_progress()).num_poms)
+
+    async def test_event_progress_sees_other_processes(self):
+        """Test that the event pom count is seeded again once it is too old,
+        counting poms added by other bot processes.
+        """
+        now = datetime.now().replace(microsecond=0)
+        await Storage.add_new_event(
+            "Event", 10, DateRange(now - timedelta(days=1), now + timedelta(days=1)))
+
+        await Storage.get_event_progress()
+        await self._add_pom_from_other_process(now)
+
+        # The count is trusted until it is too old.
+        progress = await Storage.get_event_progress()
+        max_age = timedelta(seconds=Config.EVENT_PROGRESS_MAX_AGE_SECONDS)
+        self.assertEqual(0, progress.num_poms)
+        self.assertFalse(progress.is_valid_at(datetime.now() + max_age + timedelta(seconds=1)))
+
+        with patch.object(Config, "EVENT_PROGRESS_MAX_AGE_SECONDS", -1):
+            progress.invalidate()
+            self.assertEqual(1, (await Storage.get_event_progress()).num_poms)
+
+            await self._add_pom_from_other_process(now)
+            self.assertEqual(2, (await Storage.get_event_progress()).num_poms)
+
+    async def test_event_goal_is_claimed_once(self):
+        """Test that only the first call marks the event goal as reached."""
+        now = datetime.now().replace(microsecond=0)
+        await Storage.add_new_event(
+            "Event", 1, DateRange(now - timedelta(days=1), now + timedelta(days=1)))
+        event, = await Storage.get_ongoing_events()
+
+        self.assertTrue(await Storage.mark_event_goal_reached(event))
+        self.assertFalse(await Storage.mark_event_goal_reached(event))
+
+        event, = await Storage.get_ongoing_events()
+        self.assertTrue(event.goal_reached)
+        self.assertTrue((await Storage.get_event_progress()).goal_reached)
+
+    async def test_miss_streak_follows_actions(self):
+        """Test that the persisted miss streak matches User.after_action and
+        the daily actions, and restarts on a new day.
+        """
+        today = datetime.now()
+        yesterday = today - timedelta(days=1)
+        expected_user = await Storage.get_user_by_id(self.ctx.author.id)
+
+        async def add_action(was_successful: bool, time_set: datetime):
+            nonlocal expected_user
+            await self._add_action(ActionType.HEAVY_ATTACK, was_successful, time_set=time_set)
+            expected_user = expected_user.after_action(time_set.date(), was_successful)
+
+        async def get_persisted_user():
+            Storage.user_cache.clear()
+            State.daily_actions.clear()
+            return await Storage.get_user_by_id(self.ctx.author.id)
+
+        for was_successful in (False, False, True, False, False):
+            await add_action(was_successful, yesterday)
+
+        self.assertEqual(expected_user, await get_persisted_user())
+        self.assertEqual((2, yesterday.date()),
+                         (expected_user.miss_streak, expected_user.miss_streak_date))
+        self.assertEqual(
+            2, (await Storage.get_daily_actions(self.ctx.author, yesterday)).num_misses)
+
+        await add_action(False, today)
+
+        self.assertEqual(expected_user, await get_persisted_user())
+        self.assertEqual(1, expected_user.miss_streak)
+        self.assertEqual(
+            1, (await Storage.get_daily_actions(self.ctx.author, today)).num_misses)
+
+    async def test_streamed_poms_are_ordered_and_filtered(self):
+        """Test that poms are streamed oldest first across batches, and only
+        those matching the filters.
+        """
+        other = mock_discord.MockContext().author
+        start = datetime(2021, 6, 1, 12)
+
+        for hours in (4, 1, 3, 0, 2):
+            await Storage.add_poms_to_user_session(
+                self.ctx.author, "", 1, start + timedelta(hours=hours))
+
+        await Storage.add_poms_to_user_session(other, "", 1, start + timedelta(hours=5))
+
+        all_poms = [pom async for pom in Storage.iter_poms(batch_size=2)]
+        self.assertEqual([start + timedelta(hours=hours) for hours in range(6)],
+                         [pom.time_set for pom in all_poms])
+
+        user_poms = [pom async for pom in Storage.iter_poms(user=other, batch_size=2)]
+        self.assertEqual([other.id], [pom.user_id for pom in user_poms])
+
+        date_range = DateRange(start + timedelta(hours=1), start + timedelta(hours=3))
+        dated_poms = [pom async for pom in Storage.iter_poms(date_range=date_range,
+                                                             batch_size=2)]
+        self.assertEqual([start + timedelta(hours=hours) for hours in (1, 2, 3)],
+                         [pom.time_set for pom in dated_poms])
+
+    async def test_streamed_actions_are_ordered_and_filtered(self):
+        """Test that actions are streamed oldest first across batches, and
+        only those matching the filters.
+        """
+        other = mock_discord.MockContext().author
+        await Storage.add_user(other.id, timezone.utc, "Viking")
+        start = datetime(2021, 6, 1, 12)
+
+        for hours in (2, 0, 1):
+            await self._add_action(ActionType.NORMAL_ATTACK,
+                                   time_set=start + timedelta(hours=hours))
+
+        await Storage.add_pom_war_action(other, "Viking", ActionType.DEFEND, True, False, "",
+                                         0, start + timedelta(hours=3))
+
+        all_actions = [action async for action in Storage.iter_actions(batch_size=2)]
+        self.assertEqual([start + timedelta(hours=hours) for hours in range(4)],
+                         [action.timestamp for action in all_actions])
+
+        user_actions = [action async for action in Storage.iter_actions(
+            user=self.ctx.author, batch_size=2)]
+        self.assertEqual([self.ctx.author.id] * 3, [action.user_id for action in user_actions])
+
+        dated_actions = [action async for action in Storage.iter_actions(
+            date_range=DateRange(start + timedelta(hours=2), start + timedelta(hours=3)),
+            batch_size=1)]
+        self.assertEqual([start + timedelta(hours=2), start + timedelta(hours=3)],
+                         [action.timestamp for action in dated_actions])
+
+    async def test_aggregates_of_nothing_are_zero(self):
+        """Test that aggregating no rows gives 0 rather than None."""
+        self.assertEqual(0, await Storage.count_poms())
+        self.assertEqual(0, await Storage.aggregate_actions(Aggregate.SUM, "damage"))
+        self.assertEqual(0, await Storage.aggregate_actions(Aggregate.MAX, "damage"))
+
+    async def test_aggregates_are_filtered(self):
+        """Test aggregates over a column and with the user and date filters."""
+        other = mock_discord.MockContext().author
+        await Storage.add_user(other.id, timezone.utc, "Viking")
+        start = datetime(2021, 6, 1, 12)
+
+        await Storage.add_poms_to_user_session(self.ctx.author, "", 2, start)
+        await Storage.add_poms_to_user_session(
+            self.ctx.author, "", 1, start + timedelta(days=1))
+        await Storage.add_poms_to_user_session(other, "", 4, start)
+        await self._add_action(ActionType.NORMAL_ATTACK, damage=10, time_set=start)
+        await self._add_action(ActionType.HEAVY_ATTACK, damage=40,
+                               time_set=start + timedelta(days=1))
+        await Storage.add_pom_war_action(other, "Viking", ActionType.NORMAL_ATTACK, True,
+                                         False, "", 5, start)
+        first_day = DateRange(start, start + timedelta(hours=1))
+
+        self.assertEqual(7, await Storage.count_poms())
+        self.assertEqual(3, await Storage.count_poms(user=self.ctx.author))
+        self.assertEqual(6, await Storage.count_poms(date_range=first_day))
+        self.assertEqual(2, await Storage.count_poms(user=self.ctx.author,
+                                                     date_range=first_day))
+
+        self.assertEqual(5500, await Storage.aggregate_actions(Aggregate.SUM, "damage"))
+        self.assertEqual(5000, await Storage.aggregate_actions(
+            Aggregate.SUM, "damage", user=self.ctx.author))
+        self.assertEqual(1500, await Storage.aggregate_actions(
+            Aggregate.SUM, "damage", date_range=first_day))
+        self.assertEqual(2, await Storage.count_actions(action_type=ActionType.NORMAL_ATTACK))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+
+from tests.helpers.sqlite_rows import SQLiteRowsTestCase
+
+
+class TestTransactions(SQLiteRowsTestCase):
+    """Test grouping queries into one transaction."""
+
+    async def _insert(self, value: int):
+        async with self.backend.cursor() as cursor:
+            await cursor.execute("INSERT INTO rows (value) VALUES (%s);", (value, ))
+
+    async def _values(self) -> list:
+        async with self.backend.cursor() as cursor:
+            await cursor.execute("SELECT value FROM rows ORDER BY value;")
+            return [value for value, in await cursor.fetchall()]
+
+    async def test_transaction_commits(self):
+        """Test that every query in the block is committed together."""
+        async with self.backend.transaction():
+            self.assertTrue(self.backend.in_transaction)
+            await self._insert(1)
+
+            # Nested transactions join the outer one.
+            async with self.backend.transaction():
+                await self._insert(2)
+
+        self.assertFalse(self.backend.in_transaction)
+        self.assertEqual([1, 2], await self._values())
+
+    async def test_transaction_rolls_back(self):
+        """Test that an exception undoes every query in the block."""
+        with self.assertRaises(RuntimeError):
+            async with self.backend.transaction():
+                await self._insert(1)
+                raise RuntimeError("Command failed")
+
+        self.assertEqual([], await self._values())
+
+
+if __name__ == "__main__":
+    unittest.main()
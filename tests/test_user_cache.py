@@ -0,0 +1,44 @@
+import unittest
+from datetime import timezone
+
+from pombot.lib.types import User as PombotUser
+from pombot.lib.user_cache import UserCache
+
+
+def _user(user_id: int) -> PombotUser:
+    return PombotUser(user_id, timezone.utc, "Knight", "", 1, 1, 1, 1)
+
+
+class TestUserCache(unittest.TestCase):
+    """Test caching users by userID."""
+    def test_hits_and_misses_are_counted(self):
+        """Test that lookups are counted whether or not they are cached."""
+        cache = UserCache(max_size=10)
+        cache.put([_user(1)])
+
+        self.assertEqual(_user(1), cache.get(1))
+        self.assertIsNone(cache.get(2))
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+    def test_least_recently_used_is_evicted(self):
+        """Test that the cache never grows beyond its maximum size."""
+        cache = UserCache(max_size=2)
+        cache.put([_user(1), _user(2)])
+        cache.get(1)
+        cache.put([_user(3)])
+
+        self.assertEqual(2, len(cache))
+        self.assertIsNotNone(cache.get(1))
+        self.assertIsNone(cache.get(2))
+
+    def test_invalidate(self):
+        """Test that an invalidated user is no longer cached."""
+        cache = UserCache(max_size=10)
+        cache.put([_user(1)])
+        cache.invalidate("1")
+
+        self.assertIsNone(cache.get(1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import random
+import unittest
+from collections import Counter
+
+from parameterized import parameterized
+
+from pombot.lib.weighted_sampler import WeightedSampler
+
+
+class TestWeightedSampler(unittest.TestCase):
+    """Test choosing items in proportion to their weights."""
+    @parameterized.expand([
+        ([1, 1, 1, 1], ),
+        ([9, 1], ),
+        ([0.05, 0.08, 0.07, 0.5, 0.3], ),
+        ([100, 0, 3], ),
+    ])
+    def test_frequencies_follow_weights(self, weights):
+        """Test that each item is chosen about as often as its share of the
+        total weight.
+        """
+        num_samples = 200_000
+        sampler = WeightedSampler(range(len(weights)), weights, rng=random.Random(1234))
+        counts = Counter(sampler.sample_many(num_samples))
+
+        for item, weight in enumerate(weights):
+            expected = weight / sum(weights)
+            self.assertAlmostEqual(expected, counts[item] / num_samples, delta=0.01)
+
+    def test_zero_weight_is_never_chosen(self):
+        """Test that items without weight never come up."""
+        sampler = WeightedSampler("abc", [1, 0, 1], rng=random.Random(1))
+
+        self.assertNotIn("b", sampler.sample_many(10_000))
+
+    def test_same_seed_gives_same_samples(self):
+        """Test that single and batch sampling agree given the same RNG
+        state.
+        """
+        sampler = WeightedSampler("abcde", [5, 4, 3, 2, 1])
+
+        singles = [sampler.sample(rng) for rng in [random.Random(7)] for _ in range(100)]
+        batch = sampler.sample_many(100, rng=random.Random(7))
+
+        self.assertEqual(singles, batch)
+
+    @parameterized.expand([
+        ("abc", [1, 1]),
+        ("", []),
+        ("ab", [0, 0]),
+        ("ab", [1, -1]),
+    ])
+    def test_invalid_weights_raise(self, items, weights):
+        """Test that impossible distributions are rejected."""
+        with self.assertRaises(ValueError):
+            WeightedSampler(items, weights)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from pombot.lib.write_buffer import WriteBuffer
+from tests.helpers.sqlite_rows import SQLiteRowsTestCase
+
+INSERT = "INSERT INTO rows (userID) VALUES (%s);"
+
+
+class TestWriteBuffer(SQLiteRowsTestCase):
+    """Test batching inserts with the write buffer."""
+    columns = "userID BIGINT NOT NULL"
+
+    async def _count_rows(self) -> int:
+        async with self.backend.cursor() as cursor:
+            await cursor.execute("SELECT COUNT(1) FROM rows;")
+            count, = await cursor.fetchone()
+
+        return count
+
+    async def test_rows_are_held_until_flushed(self):
+        """Test that queued rows are only written on flush."""
+        buffer = WriteBuffer(self.backend, flush_interval_seconds=60, max_rows=10)
+
+        await buffer.add(1, INSERT, [(1, ), (1, )])
+        await buffer.add(2, INSERT, [(2, )])
+
+        self.assertTrue(buffer.has_pending_for(1))
+        self.assertFalse(buffer.has_pending_for(3))
+        self.assertEqual(0, await self._count_rows())
+
+        await buffer.flush()
+
+        self.assertFalse(buffer.has_pending_for(1))
+        self.assertEqual(3, await self._count_rows())
+
+    async def test_flush_when_full(self):
+        """Test that reaching the maximum number of rows flushes at once."""
+        buffer = WriteBuffer(self.backend, flush_interval_seconds=60, max_rows=2)
+
+        await buffer.add(1, INSERT, [(1, )])
+        await buffer.add(2, INSERT, [(2, )])
+
+        self.assertEqual(2, await self._count_rows())
+
+    async def test_flush_after_interval(self):
+        """Test that queued rows are written once the interval has passed."""
+        buffer = WriteBuffer(self.backend, flush_interval_seconds=0, max_rows=10)
+
+        await buffer.add(1, INSERT, [(1, )])
+        await buffer._delayed_flush  # pylint: disable=protected-access
+
+        self.assertEqual(1, await self._count_rows())
+
+    async def test_failed_rows_are_retried(self):
+        """Test that rows which fail to be written are kept for the next
+        flush.
+        """
+        buffer = WriteBuffer(self.backend, flush_interval_seconds=60, max_rows=10,
+                             max_attempts=2)
+        insert_later = "INSERT INTO later (userID) VALUES (%s);"
+
+        await buffer.add(1, insert_later, [(1, )])
+
+        with self.assertRaises(self.backend.Error):
+            await buffer.flush()
+
+        self.assertTrue(buffer.has_pending_for(1))
+
+        async with self.backend.cursor() as cursor:
+            await cursor.execute("CREATE TABLE later (userID BIGINT NOT NULL);")
+
+        await buffer.flush()
+
+        self.assertFalse(buffer.has_pending_for(1))
+
+    async def test_rows_are_dropped_after_max_attempts(self):
+        """Test that rows are dropped, and their users reported, once every
+        attempt has failed.
+        """
+        dropped_user_ids = []
+        buffer = WriteBuffer(self.backend, flush_interval_seconds=60, max_rows=10,
+                             max_attempts=2, on_drop=dropped_user_ids.append)
+
+        await buffer.add(1, "INSERT INTO missing (userID) VALUES (%s);", [(1, )])
+
+        for _ in range(2):
+            with self.assertRaises(self.backend.Error):
+                await buffer.flush()
+
+        self.assertFalse(buffer.has_pending_for(1))
+        self.assertEqual([{1}], dropped_user_ids)
+
+    async def test_rows_survive_connection_timeouts(self):
+        """Test that rows are kept when no connection can be had, and that
+        their users are reported once they are dropped.
+        """
+        dropped_user_ids = []
+        buffer = WriteBuffer(self.backend, flush_interval_seconds=60, max_rows=10,
+                             max_attempts=2, on_drop=dropped_user_ids.append)
+
+        await buffer.add(1, INSERT, [(1, )])
+
+        with patch.object(self.backend, "cursor", side_effect=asyncio.TimeoutError):
+            with self.assertRaises(asyncio.TimeoutError):
+                await buffer.flush()
+
+            self.assertTrue(buffer.has_pending_for(1))
+
+            with self.assertRaises(asyncio.TimeoutError):
+                await buffer.flush()
+
+        self.assertFalse(buffer.has_pending_for(1))
+        self.assertEqual([{1}], dropped_user_ids)
+
+    async def test_cancelled_flush_keeps_rows(self):
+        """Test that a cancelled flush queues its rows again."""
+        buffer = WriteBuffer(self.backend, flush_interval_seconds=60, max_rows=10)
+
+        await buffer.add(1, INSERT, [(1, )])
+
+        with patch.object(self.backend, "cursor", side_effect=asyncio.CancelledError):
+            with self.assertRaises(asyncio.CancelledError):
+                await buffer.flush()
+
+        self.assertTrue(buffer.has_pending_for(1))
+
+        await buffer.flush()
+
+        self.assertEqual(1, await self._count_rows())
+
+    async def test_failed_timed_flush_is_logged(self):
+        """Test that errors of a timed flush are logged, not raised."""
+        buffer = WriteBuffer(self.backend, flush_interval_seconds=0, max_rows=10,
+                             max_attempts=2)
+
+        await buffer.add(1, INSERT, [(1, )])
+
+        with patch.object(self.backend, "cursor", side_effect=asyncio.TimeoutError), \
+                self.assertLogs("pombot.lib.write_buffer", "ERROR"):
+            await buffer._delayed_flush  # pylint: disable=protected-access
+
+        self.assertTrue(buffer.has_pending_for(1))
+
+
+if __name__ == "__main__":
+    unittest.main()